@@ -1,12 +1,18 @@
-import json
+import atexit
 import os
 import logging
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass
 from pathlib import Path
+from .file_utils import atomic_write_bytes, ensure_dir, file_signature, json_dumps, json_loads
 
 logger = logging.getLogger(__name__)
 
+# Accounts data already loaded/saved by this process, keyed by file path: (file signature, data)
+_STORE_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Dict]]] = {}
+
 @dataclass
 class Account:
     id: str
@@ -16,28 +22,94 @@ class Account:
     phone: str
     session_path: str
 
+def _account_number(account_id: str) -> Optional[int]:
+    """n of an "acc_n" account id, or None for ids in any other format"""
+    if not account_id.startswith('acc_'):
+        return None
+    try:
+        number = int(account_id[4:])
+    except ValueError:
+        return None
+    return number if number >= 0 else None
+
+def _account_to_dict(account: Account) -> Dict:
+    """Flat dict of an Account (cheaper than dataclasses.asdict, which deep-copies every field)"""
+    return {
+        'id': account.id,
+        'label': account.label,
+        'api_id': account.api_id,
+        'api_hash': account.api_hash,
+        'phone': account.phone,
+        'session_path': account.session_path
+    }
+
 class AccountStore:
     def __init__(self, accounts_file: str = "accounts.json"):
         self.accounts_file = accounts_file
         self.accounts: Dict[str, Account] = {}
         self.cloud_storage = None
+        self._cloud_checked = False
+        self._batch_depth = 0
+        self._dirty = False
+        self._id_bitmap = 0
+        # Single background worker so B2 uploads never block the caller
+        self._upload_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="accounts-b2")
+        self._pending_future = None
+        atexit.register(self._upload_exec.shutdown, wait=True)
         self.load()
     
     def _get_cloud_storage(self):
         """Get cloud storage instance (lazy loading)"""
-        if not self.cloud_storage:
-            try:
-                from .cloud_storage import BackblazeB2Storage
-                self.cloud_storage = BackblazeB2Storage()
-                if not self.cloud_storage.backup_enabled:
-                    self.cloud_storage = None
-            except Exception as e:
-                logger.debug(f"Cloud storage not available: {e}")
+        if self._cloud_checked:
+            return self.cloud_storage
+        self._cloud_checked = True
+        try:
+            from .cloud_storage import BackblazeB2Storage
+            self.cloud_storage = BackblazeB2Storage()
+            if not self.cloud_storage.backup_enabled:
                 self.cloud_storage = None
+        except Exception as e:
+            logger.debug(f"Cloud storage not available: {e}")
+            self.cloud_storage = None
         return self.cloud_storage
     
+    def invalidate_cache(self):
+        """Forget the in-memory copy of the accounts file (call after writing it externally)"""
+        _STORE_CACHE.pop(self.accounts_file, None)
+    
+    def _remember(self, data: Dict[str, Dict]):
+        signature = file_signature(self.accounts_file)
+        if signature is not None:
+            _STORE_CACHE[self.accounts_file] = (signature, data)
+    
     def load(self):
         """Load accounts from JSON file, try B2 first if available"""
+        self._load()
+        self._rebuild_id_bitmap()
+    
+    def _rebuild_id_bitmap(self):
+        """Recompute the bitfield of used account numbers (bit n set <=> acc_n exists)"""
+        bitmap = 0
+        for acc_id in self.accounts:
+            number = _account_number(acc_id)
+            if number is None:
+                # Loaded from accounts.json or a B2 backup; an odd id must not keep the store from loading
+                logger.warning(f"Ignoring account id {acc_id!r} when tracking used account numbers")
+                continue
+            bitmap |= 1 << number
+        self._id_bitmap = bitmap
+    
+    def _load(self):
+        # Reuse data this process already loaded if the file is unchanged since
+        cached = _STORE_CACHE.get(self.accounts_file)
+        if cached and cached[0] == file_signature(self.accounts_file):
+            self.accounts = {
+                acc_id: Account(**acc_data)
+                for acc_id, acc_data in cached[1].items()
+            }
+            logger.debug(f"Loaded {len(self.accounts)} accounts from in-memory cache")
+            return
+        
         # Try to restore from B2 first
         cloud_storage = self._get_cloud_storage()
         if cloud_storage:
@@ -53,14 +125,7 @@ class AccountStore:
                     logger.info(f"Loaded {len(self.accounts)} accounts from B2")
                     
                     # Try to restore sessions from B2
-                    restored_count = 0
-                    for account_id, account in self.accounts.items():
-                        logger.info(f"Attempting to restore session for account {account_id} from path: {account.session_path}")
-                        if cloud_storage.restore_session(account_id, account.session_path):
-                            restored_count += 1
-                            logger.info(f"Successfully restored session from B2 for account {account_id}")
-                        else:
-                            logger.warning(f"Failed to restore session from B2 for account {account_id}")
+                    restored_count = self._restore_sessions(cloud_storage, list(self.accounts.values()))
                     logger.info(f"Restored {restored_count}/{len(self.accounts)} sessions from B2")
                     
                     return
@@ -70,86 +135,122 @@ class AccountStore:
         # Fallback to local file
         if os.path.exists(self.accounts_file):
             try:
-                with open(self.accounts_file, 'r') as f:
-                    data = json.load(f)
-                    self.accounts = {
-                        acc_id: Account(**acc_data) 
-                        for acc_id, acc_data in data.items()
-                    }
+                data = json_loads(Path(self.accounts_file).read_bytes())
+                self.accounts = {
+                    acc_id: Account(**acc_data) 
+                    for acc_id, acc_data in data.items()
+                }
+                self._remember(data)
                 
                 # Try to restore sessions from B2 even if accounts loaded locally
                 cloud_storage = self._get_cloud_storage()
                 if cloud_storage:
-                    restored_count = 0
-                    for account_id, account in self.accounts.items():
-                        if not os.path.exists(account.session_path):
-                            logger.info(f"Session file missing for {account_id}, attempting restore from B2: {account.session_path}")
-                            if cloud_storage.restore_session(account_id, account.session_path):
-                                restored_count += 1
-                                logger.info(f"Restored missing session from B2 for account {account_id}")
-                            else:
-                                logger.warning(f"Failed to restore missing session from B2 for account {account_id}")
+                    missing = [
+                        account for account in self.accounts.values()
+                        if not os.path.exists(account.session_path)
+                    ]
+                    restored_count = self._restore_sessions(cloud_storage, missing)
                     if restored_count > 0:
                         logger.info(f"Restored {restored_count} missing sessions from B2")
             except Exception as e:
                 logger.error(f"Error loading accounts: {e}")
                 self.accounts = {}
     
-    def _save_local(self):
+    def _restore_session(self, cloud_storage, account: Account) -> bool:
+        """Restore a single session file from B2"""
+        logger.info(f"Attempting to restore session for account {account.id} from path: {account.session_path}")
+        if cloud_storage.restore_session(account.id, account.session_path):
+            logger.info(f"Successfully restored session from B2 for account {account.id}")
+            return True
+        logger.warning(f"Failed to restore session from B2 for account {account.id}")
+        return False
+    
+    def _restore_sessions(self, cloud_storage, accounts: List[Account]) -> int:
+        """Restore session files from B2 concurrently, returns number restored"""
+        if not accounts:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(5, len(accounts))) as executor:
+            results = list(executor.map(lambda account: self._restore_session(cloud_storage, account), accounts))
+        return sum(results)
+    
+    def _save_local(self, data: Optional[Dict[str, Dict]] = None):
         """Save accounts to local JSON file"""
         try:
-            os.makedirs(os.path.dirname(self.accounts_file) if os.path.dirname(self.accounts_file) else '.', exist_ok=True)
+            ensure_dir(os.path.dirname(self.accounts_file))
             
-            data = {
-                acc_id: asdict(account) 
-                for acc_id, account in self.accounts.items()
-            }
-            with open(self.accounts_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            logger.info(f"Saved {len(self.accounts)} accounts to {self.accounts_file}")
+            if data is None:
+                data = {
+                    acc_id: _account_to_dict(account) 
+                    for acc_id, account in self.accounts.items()
+                }
+            atomic_write_bytes(self.accounts_file, json_dumps(data))
+            self._remember(data)
+            logger.debug("Saved %d accounts to %s", len(self.accounts), self.accounts_file)
         except Exception as e:
             logger.error(f"Error saving accounts locally: {e}")
     
+    @contextmanager
+    def batched(self):
+        """Defer saving until the outermost batch exits (one write + one upload per batch)"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self.save()
+    
     def save(self):
         """Save accounts to JSON file and backup to B2"""
+        if self._batch_depth > 0:
+            self._dirty = True
+            return
+        self._dirty = False
         try:
             data = {
-                acc_id: asdict(account) 
+                acc_id: _account_to_dict(account) 
                 for acc_id, account in self.accounts.items()
             }
             
             # Save locally first
-            self._save_local()
+            self._save_local(data)
             
-            # Backup to B2 if available
+            # Backup to B2 in the background (last write wins)
             cloud_storage = self._get_cloud_storage()
             if cloud_storage:
-                try:
-                    cloud_storage.backup_accounts(data)
-                except Exception as e:
-                    logger.warning(f"Failed to backup accounts to B2: {e}")
+                if self._pending_future is not None:
+                    self._pending_future.cancel()
+                self._pending_future = self._upload_exec.submit(self._backup_to_b2, cloud_storage, data)
                 
         except Exception as e:
             logger.error(f"Error saving accounts: {e}")
             import traceback
             traceback.print_exc()
     
+    def _backup_to_b2(self, cloud_storage, data: Dict):
+        """Upload an accounts snapshot to B2 (runs on the upload worker)"""
+        try:
+            cloud_storage.backup_accounts(data)
+        except Exception as e:
+            logger.warning(f"Failed to backup accounts to B2: {e}")
+    
     def create_account(self, label: str, api_id: int, api_hash: str, phone: str) -> Account:
         """Create a new account (max 5 accounts)"""
         if len(self.accounts) >= 5:
             raise ValueError("Limit of 5 accounts reached")
         
         # Generate next account ID
-        existing_ids = [int(acc_id.split('_')[1]) for acc_id in self.accounts.keys()]
-        next_id = 1
-        while next_id in existing_ids:
-            next_id += 1
+        # Lowest free account number in 1..5
+        free = ~self._id_bitmap & 0b111110
+        if free == 0:
+            raise ValueError("Limit of 5 accounts reached")
+        next_id = (free & -free).bit_length() - 1
         
         account_id = f"acc_{next_id}"
         session_path = f"sessions/tg_ui_session_{account_id}.session"
         
         # Ensure sessions directory exists
-        os.makedirs("sessions", exist_ok=True)
+        ensure_dir("sessions")
         
         account = Account(
             id=account_id,
@@ -161,6 +262,7 @@ class AccountStore:
         )
         
         self.accounts[account_id] = account
+        self._id_bitmap |= 1 << next_id
         self.save()
         
         # Backup session file to B2 if available
@@ -191,12 +293,16 @@ class AccountStore:
         
         # Remove session file if it exists
         try:
-            if os.path.exists(account.session_path):
-                os.remove(account.session_path)
-        except Exception:
-            pass  # Ignore errors silently
+            os.remove(account.session_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to remove session file {account.session_path}: {e}")
         
         del self.accounts[account_id]
+        number = _account_number(account_id)
+        if number is not None:
+            self._id_bitmap &= ~(1 << number)
         self.save()
         return True
 
@@ -1,16 +1,178 @@
-import json
+import atexit
+import functools
+import heapq
 import os
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Optional, Any, List
-from dataclasses import dataclass, asdict
+from types import MappingProxyType
+from typing import Dict, Optional, Any, Iterable, List, Mapping, Tuple, Union
+from dataclasses import dataclass, fields
+from pathlib import Path
 import logging
-from .group_store import GroupStore
+from .file_utils import ensure_dir, file_signature, json_dumps, json_loads, payload_digest, write_if_changed
 # Lazy import for cloud storage to avoid loading heavy modules on startup
 # from .cloud_storage import CloudStorageManager, LocalCloudStorage
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+
+
+def __getattr__(name):
+    # GroupStore is imported on first use (PEP 562), keeping it off the import path of this module
+    if name == 'GroupStore':
+        from .group_store import GroupStore
+        globals()['GroupStore'] = GroupStore
+        return GroupStore
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Checkpoint updates are journaled one line each and compacted into the full file
+# after this many updates or this many seconds
+CHECKPOINT_FLUSH_EVERY = 1000
+CHECKPOINT_FLUSH_INTERVAL = 60.0
+# Cloud backups of saved checkpoints are coalesced: at most one upload per this many seconds
+CLOUD_BACKUP_DEBOUNCE = 5.0
+
+# Checkpoint file writes and journal appends run on this single thread, in submission order
+_CHECKPOINT_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+# Cloud uploads (debounced backups, auto backups with pruning) run one at a time on their own thread,
+# so a slow network never holds up local saves
+_CLOUD_UPLOADER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cloud-uploader")
+
+# Live managers, so buffered checkpoint updates can be flushed at interpreter exit
+_LIVE_MANAGERS: "weakref.WeakSet[CheckpointManager]" = weakref.WeakSet()
+
+
+def _flush_live_managers():
+    """Save buffered checkpoint updates and upload pending cloud backups; debounce timers die with the process"""
+    for manager in list(_LIVE_MANAGERS):
+        try:
+            manager.flush(upload=False)
+            # Cancels the debounce timer and uploads its snapshot before the process exits
+            manager._submit_upload(manager._flush_cloud_backup).result()
+        except Exception as e:
+            logger.error(f"Error flushing checkpoints for account {manager.account_id} at exit: {e}")
+
+
+atexit.register(_flush_live_managers)
+
+# Local-time and UTC ISO timestamps reused for updates within NOW_ISO_RESOLUTION seconds of each other
+NOW_ISO_RESOLUTION = 0.25
+_now_iso_cache: Tuple[float, str] = (float('-inf'), '')
+_utcnow_iso_cache: Tuple[float, str] = (float('-inf'), '')
+
+
+def _now_iso() -> str:
+    """datetime.now().isoformat(), recomputed at most every NOW_ISO_RESOLUTION seconds"""
+    global _now_iso_cache
+    now = time.monotonic()
+    if now - _now_iso_cache[0] > NOW_ISO_RESOLUTION:
+        _now_iso_cache = (now, datetime.now().isoformat())
+    return _now_iso_cache[1]
+
+
+def _utcnow_iso() -> str:
+    """Naive UTC ISO timestamp (same format as datetime.utcnow().isoformat()), cached like _now_iso"""
+    global _utcnow_iso_cache
+    now = time.monotonic()
+    if now - _utcnow_iso_cache[0] > NOW_ISO_RESOLUTION:
+        _utcnow_iso_cache = (now, datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+    return _utcnow_iso_cache[1]
+
+@functools.lru_cache(maxsize=4096)
+def _deletes_at_utc(value: str) -> datetime:
+    """Aware UTC datetime for a temporary message's deletes_at (with or without timezone), parsed once per string"""
+    deletes_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if deletes_at.tzinfo is None:
+        return deletes_at.replace(tzinfo=timezone.utc)
+    return deletes_at.astimezone(timezone.utc)
+
+# Temporary messages live in one SQLite table per account; only the rows changed since the last write are written
+_TEMPORARY_MESSAGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS temporary_messages (
+    key TEXT PRIMARY KEY,
+    account_id TEXT,
+    chat_id INTEGER,
+    chat_title TEXT,
+    message_id INTEGER,
+    sent_at TEXT,
+    deletes_at TEXT,
+    deletes_at_epoch REAL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_temporary_messages_expiry ON temporary_messages (deleted, deletes_at_epoch);
+"""
+_TEMPORARY_MESSAGE_FIELDS = ('account_id', 'chat_id', 'chat_title', 'message_id', 'sent_at', 'deletes_at')
+
+# Checkpoint files already parsed/written by this process, keyed by path: (file signature, data)
+_CHECKPOINTS_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Dict]]] = {}
+
+# Where LocalCloudStorage (the fallback backend) keeps its backup files, one directory per account
+LOCAL_BACKUP_DIR = 'cloud_backups'
+
+# Cloud backend shared by every manager in the process (backends take the account id per call)
+_CLOUD_STORAGE = None
+_CLOUD_STORAGE_LOCK = threading.Lock()
+
+
+def _shared_cloud_storage():
+    """Pick the cloud backend once per process - prioritize Backblaze B2, then GitHub Gists, fallback to local"""
+    global _CLOUD_STORAGE
+    if _CLOUD_STORAGE is not None:
+        return _CLOUD_STORAGE
+    # The upload thread and request handlers may both get here first; probe the environment only once
+    with _CLOUD_STORAGE_LOCK:
+        if _CLOUD_STORAGE is not None:
+            return _CLOUD_STORAGE
+        try:
+            # Lazy import to avoid loading heavy modules on startup
+            from .cloud_storage import BackblazeB2Storage, GitHubGistsStorage, LocalCloudStorage
+            
+            # Try Backblaze B2 first (if configured)
+            b2_storage = BackblazeB2Storage()
+            if b2_storage.backup_enabled:
+                _CLOUD_STORAGE = b2_storage
+                logger.info("Using Backblaze B2 for cloud storage")
+            else:
+                # Try GitHub Gists second (free and reliable)
+                github_storage = GitHubGistsStorage()
+                if github_storage.backup_enabled:
+                    _CLOUD_STORAGE = github_storage
+                    logger.info("Using GitHub Gists for cloud storage")
+                else:
+                    # Fallback to local storage
+                    _CLOUD_STORAGE = LocalCloudStorage()
+                    logger.info("Using local storage for cloud backups")
+        except Exception as e:
+            logger.warning(f"Failed to initialize cloud storage, using local fallback: {e}")
+            from .cloud_storage import LocalCloudStorage
+            _CLOUD_STORAGE = LocalCloudStorage()
+        return _CLOUD_STORAGE
+
+
+def _cloud_restore_possible(account_id: str) -> bool:
+    """Cheap check for a backup source of this account, without loading the cloud module if no backend is in use yet"""
+    if _CLOUD_STORAGE is not None:
+        return _CLOUD_STORAGE.has_backup(account_id)
+    if os.getenv('B2_APPLICATION_KEY_ID') and os.getenv('B2_APPLICATION_KEY') and os.getenv('B2_BUCKET_NAME'):
+        return True
+    if os.getenv('GITHUB_TOKEN'):
+        return True
+    # Local backups sit in a per-account directory; older ones stay at the top level until the backend moves them
+    prefix = f"telegram_delete_backup_{account_id}_"
+    for directory in (os.path.join(LOCAL_BACKUP_DIR, account_id), LOCAL_BACKUP_DIR):
+        try:
+            with os.scandir(directory) as entries:
+                if any(entry.name.startswith(prefix) for entry in entries):
+                    return True
+        except OSError:
+            pass
+    return False
+
+@dataclass(slots=True)
 class ChatCheckpoint:
     chat_id: int
     chat_title: str
@@ -30,15 +192,84 @@ class ChatCheckpoint:
     send_status: Optional[str] = None
     send_error: Optional[str] = None
 
+_CP_FIELDS = tuple(f.name for f in fields(ChatCheckpoint))
+
+# Progress counter incremented for each final chat status
+_STATUS_COUNTERS = {'completed': 'completed', 'skipped': 'skipped', 'error': 'errors'}
+
+# Stand-in for a chat with no previous scanned_chats entry: lookups fall back to these defaults
+_NO_CHAT: Dict[str, Any] = {'group_rules': ''}
+
+# Scan-memory fields cleared by reset_all_data (messages_deleted / total_messages_found are history and kept)
+_RESET_TEMPLATE = (
+    ('last_scan_date', None),
+    ('last_message_id', None),
+    ('scan_state', 'idle'),
+    ('total_estimate', None),
+    ('scanned_count', 0),
+    ('has_unscanned_dates', False),
+)
+
+
+def _checkpoint_to_dict(checkpoint: ChatCheckpoint) -> Dict[str, Any]:
+    """Flat dict of a ChatCheckpoint (cheaper than dataclasses.asdict, which deep-copies every field)"""
+    return {name: getattr(checkpoint, name) for name in _CP_FIELDS}
+
+
+def _checkpoints_from_data(data: Dict[str, Dict]) -> Dict[int, ChatCheckpoint]:
+    """Rebuild checkpoints keyed by int chat id; one comprehension, falling back per entry on bad records"""
+    try:
+        return {int(chat_id): ChatCheckpoint(**checkpoint_data) for chat_id, checkpoint_data in data.items()}
+    except (TypeError, ValueError):
+        pass
+    checkpoints = {}
+    for chat_id, checkpoint_data in data.items():
+        try:
+            checkpoints[int(chat_id)] = ChatCheckpoint(**checkpoint_data)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping malformed checkpoint for chat {chat_id}: {e}")
+    return checkpoints
+
 class CheckpointManager:
     def __init__(self, account_id: str):
         self.account_id = account_id
         self.checkpoints_file = f"sessions/checkpoints_{account_id}.json"
+        self._checkpoints_tmp = f"{self.checkpoints_file}.tmp"
+        self._sessions_dir = os.path.dirname(self.checkpoints_file)
+        # Append-only journal of checkpoint updates made since the last full save
+        self.checkpoints_log_file = f"sessions/checkpoints_{account_id}.log"
+        self._journal = None
         self.groups_cache_file = f"sessions/groups_{account_id}.json"
         # Also try the old format for backward compatibility
         self.groups_cache_file_alt = f"sessions/groups_{account_id.replace('acc_', '')}.json"
         self.meta_file = f"sessions/account_meta_{account_id}.json"
-        self.checkpoints: Dict[int, ChatCheckpoint] = {}
+        # Checkpoints are read from disk on first access (see the `checkpoints` property)
+        self._checkpoints: Dict[int, ChatCheckpoint] = {}
+        self._checkpoints_loaded = False
+        # Serialized form of each checkpoint, kept in step with the changes made through this manager
+        self._serialized: Optional[Dict[str, Dict]] = None
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+        # Snapshot waiting for the writer thread (newer saves replace it) and the last submitted write
+        self._write_lock = threading.Lock()
+        self._pending_snapshot = None
+        # Temporary message keys changed since the last write to the SQLite store
+        self._temporary_dirty: set = set()
+        self._last_write = None
+        # Newest saved snapshot waiting for its debounced cloud upload
+        self._pending_cloud = None
+        self._cloud_timer: Optional[threading.Timer] = None
+        # Content digest of the last successful upload per backup kind, to skip unchanged re-uploads
+        self._backup_digests: Dict[str, bytes] = {}
+        # Position of each chat id in current_progress['scanned_chats'], for the list object it was built from
+        self._chat_positions: Dict[Any, int] = {}
+        self._indexed_chats: Optional[List[Dict]] = None
+        self._indexed_len = 0
+        # get_progress() snapshots are rebuilt only when the progress changed since the last one
+        self._progress_version = 0
+        self._progress_snapshot: Optional[Dict] = None
+        self._progress_snapshot_key = None
+        _LIVE_MANAGERS.add(self)
         self.current_progress = {
             'current_chat': '',
             'chat_id': 0,
@@ -52,29 +283,33 @@ class CheckpointManager:
             'scanned_chats': []
         }
         self.backup_retention_days = int(os.getenv('CLOUD_BACKUP_RETENTION_DAYS', '7'))
-        self.groups_cache = {
-            'groups': [],
-            'updated_at': None,
-            'owner_id': None
-        }
-        self.group_store = GroupStore(account_id)
-        self.meta: Dict[str, Any] = {
-            'owner_id': None,
-            'updated_at': None
-        }
+        # Group cache, account meta and the group store are read from disk on first access
+        self._groups_cache: Optional[Dict[str, Any]] = None
+        self._meta: Optional[Dict[str, Any]] = None
+        self.temporary_messages_db = f"sessions/temporary_messages_{account_id}.db"
+        # Older JSON store, migrated into the database on first load
         self.temporary_messages_file = f"sessions/temporary_messages_{account_id}.json"
+        # Opened on the first temporary message write (or a read of an existing database); the loading
+        # thread, the writer thread and the exit flush all use it, one at a time under _temporary_lock
+        self._temporary_conn: Optional[sqlite3.Connection] = None
+        self._temporary_lock = threading.Lock()
         self.temporary_messages: Dict[str, Dict[str, Any]] = {}
+        # deletes_at as epoch seconds for each pending (not deleted) temporary message, so the expiry
+        # checks compare floats instead of parsing the ISO strings
+        self._expiry_epochs: Dict[str, float] = {}
+        # Min-heap of (deletes_at epoch, key) for pending temporary messages, and the keys already popped
+        # off it as expired (in expiry order) until they are marked deleted or removed
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._expired_keys: Dict[str, None] = {}
         
         # Initialize cloud storage (lazy loading)
         self.cloud_storage = None
         
-        # Load checkpoints first, then try to restore from cloud only if no local data
-        self.load_checkpoints()
-        self._load_meta()
-        self.load_groups_cache()
+        # Checkpoints, groups cache and meta load lazily; only try to restore from cloud if there is no local data
         self.load_temporary_messages()
-        # Only restore from cloud if we have no local data (non-blocking, don't fail startup)
-        if len(self.checkpoints) == 0 and len(self.current_progress.get('scanned_chats', [])) == 0:
+        # Only restore from cloud if we have no local data and there is a backup source (non-blocking, don't fail startup)
+        if (not self._has_local_checkpoints() and len(self.current_progress.get('scanned_chats', [])) == 0
+                and _cloud_restore_possible(account_id)):
             try:
                 self.restore_from_cloud()
             except Exception as restore_error:
@@ -82,112 +317,265 @@ class CheckpointManager:
                 logger.debug(f"Cloud restore failed during initialization (non-critical): {restore_error}")
     
     def _get_cloud_storage(self):
-        """Get cloud storage instance (lazy loading) - prioritize Backblaze B2, then GitHub Gists, fallback to local"""
-        if not self.cloud_storage:
-            try:
-                # Lazy import to avoid loading heavy modules on startup
-                from .cloud_storage import BackblazeB2Storage, GitHubGistsStorage, LocalCloudStorage
-                
-                # Try Backblaze B2 first (if configured)
-                b2_storage = BackblazeB2Storage()
-                if b2_storage.backup_enabled:
-                    self.cloud_storage = b2_storage
-                    logger.info(f"Using Backblaze B2 for cloud storage for account {self.account_id}")
-                else:
-                    # Try GitHub Gists second (free and reliable)
-                    github_storage = GitHubGistsStorage()
-                    if github_storage.backup_enabled:
-                        self.cloud_storage = github_storage
-                        logger.info(f"Using GitHub Gists for cloud storage for account {self.account_id}")
-                    else:
-                        # Fallback to local storage
-                        self.cloud_storage = LocalCloudStorage()
-                        logger.info(f"Using local storage for account {self.account_id}")
-            except Exception as e:
-                logger.warning(f"Failed to initialize cloud storage, using local fallback: {e}")
-                from .cloud_storage import LocalCloudStorage
-                self.cloud_storage = LocalCloudStorage()
-        return self.cloud_storage
+        """Get cloud storage instance (lazy loading, shared by all accounts - see _shared_cloud_storage)"""
+        storage = self.cloud_storage
+        if storage is None:
+            storage = self.cloud_storage = _shared_cloud_storage()
+        return storage
+    
+    @property
+    def groups_cache(self) -> Dict[str, Any]:
+        if self._groups_cache is None:
+            self._groups_cache = {'groups': [], 'updated_at': None, 'owner_id': None}
+            self.load_groups_cache()
+        return self._groups_cache
+    
+    @groups_cache.setter
+    def groups_cache(self, value: Dict[str, Any]):
+        self._groups_cache = value
+    
+    @property
+    def meta(self) -> Dict[str, Any]:
+        if self._meta is None:
+            self._meta = {'owner_id': None, 'updated_at': None}
+            self._load_meta()
+        return self._meta
+    
+    @meta.setter
+    def meta(self, value: Dict[str, Any]):
+        self._meta = value
+    
+    @functools.cached_property
+    def group_store(self):
+        from .group_store import GroupStore
+        return GroupStore(self.account_id)
+    
+    @property
+    def current_progress(self) -> Dict:
+        return self._current_progress
+    
+    @current_progress.setter
+    def current_progress(self, value: Dict):
+        self._current_progress = value
+        self._progress_version += 1
+        # Chat id -> (status, messages_found) already included in this progress dict's counters
+        self._counted_chats: Dict[Any, Tuple[str, int]] = {}
+    
+    @property
+    def checkpoints(self) -> Dict[int, ChatCheckpoint]:
+        if not self._checkpoints_loaded:
+            self.load_checkpoints()
+        return self._checkpoints
+    
+    @checkpoints.setter
+    def checkpoints(self, value: Dict[int, ChatCheckpoint]):
+        self._checkpoints = value
+        self._checkpoints_loaded = True
+        self._serialized = None
+    
+    def _has_local_checkpoints(self) -> bool:
+        """Whether checkpoints exist locally, without reading them"""
+        if self._checkpoints_loaded:
+            return len(self._checkpoints) > 0
+        return os.path.exists(self.checkpoints_file) or os.path.exists(self.checkpoints_log_file)
     
     def load_checkpoints(self):
         """Load checkpoints from file"""
-        if os.path.exists(self.checkpoints_file):
+        self._checkpoints_loaded = True
+        signature = file_signature(self.checkpoints_file)
+        if signature is not None:
             try:
-                with open(self.checkpoints_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.checkpoints = {
-                        int(chat_id): ChatCheckpoint(**checkpoint_data)
-                        for chat_id, checkpoint_data in data.items()
-                    }
+                cached = _CHECKPOINTS_CACHE.get(self.checkpoints_file)
+                if cached and cached[0] == signature:
+                    data = cached[1]
+                else:
+                    data = json_loads(Path(self.checkpoints_file).read_bytes())
+                    _CHECKPOINTS_CACHE[self.checkpoints_file] = (signature, data)
+                self.checkpoints = _checkpoints_from_data(data)
                 logger.info(f"Loaded {len(self.checkpoints)} checkpoints for account {self.account_id}")
             except Exception as e:
                 logger.error(f"Error loading checkpoints: {e}")
                 self.checkpoints = {}
+        self._replay_checkpoints_log()
+    
+    def _replay_checkpoints_log(self):
+        """Apply journaled checkpoint updates on top of the last full save (last write wins)"""
+        if not os.path.exists(self.checkpoints_log_file):
+            return
+        replayed = 0
+        try:
+            with open(self.checkpoints_log_file, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        checkpoint_data = json_loads(line)
+                    except ValueError:
+                        # A torn trailing line from an interrupted append
+                        logger.warning(f"Skipping unreadable checkpoint journal entry for account {self.account_id}")
+                        continue
+                    self.checkpoints[int(checkpoint_data['chat_id'])] = ChatCheckpoint(**checkpoint_data)
+                    replayed += 1
+        except Exception as e:
+            logger.error(f"Error replaying checkpoint journal: {e}")
+            return
+        self._dirty_count = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} journaled checkpoint updates for account {self.account_id}")
+    
+    def _submit_write(self, fn, *args):
+        """Run fn on the checkpoint writer thread (inline once the writer has shut down at exit)"""
+        try:
+            self._last_write = _CHECKPOINT_WRITER.submit(fn, *args)
+        except RuntimeError:
+            fn(*args)
+    
+    def _submit_upload(self, fn, *args) -> Future:
+        """Run fn on the cloud upload thread (inline once the uploader has shut down at exit)"""
+        try:
+            return _CLOUD_UPLOADER.submit(fn, *args)
+        except RuntimeError:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+    
+    def wait_for_writes(self):
+        """Block until everything submitted to the writer so far has been written"""
+        future = self._last_write
+        if future is not None:
+            future.result()
+    
+    def _append_checkpoints_log(self, checkpoint_data: Dict[str, Any]):
+        """Journal a single checkpoint update (one line, O(1) regardless of checkpoint count)"""
+        self._submit_write(self._write_checkpoints_log_line, checkpoint_data)
+    
+    def _write_checkpoints_log_line(self, checkpoint_data: Dict[str, Any]):
+        try:
+            if self._journal is not None and os.fstat(self._journal.fileno()).st_nlink == 0:
+                # Another manager for this account compacted and removed the journal under us
+                self._journal.close()
+                self._journal = None
+            if self._journal is None:
+                ensure_dir(self._sessions_dir)
+                # Unbuffered: every line reaches the OS as soon as it is written
+                self._journal = open(self.checkpoints_log_file, 'ab', buffering=0)
+            self._journal.write(json_dumps(checkpoint_data) + b'\n')
+        except Exception as e:
+            logger.error(f"Error journaling checkpoint for chat {checkpoint_data['chat_id']}: {e}")
+    
+    def _truncate_checkpoints_log(self):
+        """Drop the journal once its updates are part of the full checkpoints file"""
+        journal, self._journal = self._journal, None
+        try:
+            if journal is not None:
+                journal.close()
+            os.remove(self.checkpoints_log_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error truncating checkpoint journal: {e}")
+    
+    def _serialize_all(self) -> Dict[str, Dict]:
+        """Checkpoints as plain JSON-ready dicts keyed by chat id (all fields are str/int/bool/None)"""
+        if self._serialized is None:
+            self._serialized = {
+                str(chat_id): _checkpoint_to_dict(checkpoint) for chat_id, checkpoint in self.checkpoints.items()
+            }
+        # Per-checkpoint dicts are replaced on change, never mutated, so a shallow copy is a stable snapshot
+        return dict(self._serialized)
     
     def save_checkpoints(self):
-        """Save checkpoints to file and backup to cloud"""
+        """Queue a save of checkpoints to file on the writer thread, followed by a debounced cloud backup"""
+        snapshot = (self._serialize_all(), self.get_progress(), dict(self.groups_cache))
+        with self._write_lock:
+            queued = self._pending_snapshot is not None
+            self._pending_snapshot = snapshot
+        if not queued:
+            self._submit_write(self._write_pending_snapshot)
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+    
+    def _write_pending_snapshot(self):
+        """Write the newest queued snapshot locally and schedule its cloud backup (writer thread)"""
+        with self._write_lock:
+            snapshot, self._pending_snapshot = self._pending_snapshot, None
+        if snapshot is None:
+            return
+        data, progress, groups = snapshot
         try:
-            os.makedirs(os.path.dirname(self.checkpoints_file), exist_ok=True)
+            ensure_dir(self._sessions_dir)
             
-            # Convert datetime objects to strings for JSON serialization
-            def convert_datetime(obj):
-                if hasattr(obj, 'isoformat'):
-                    return obj.isoformat()
-                return obj
+            # Save locally, unless the file already holds exactly these bytes
+            payload = json_dumps(data)
+            digest = payload_digest(payload)
+            if write_if_changed(self.checkpoints_file, payload, self._checkpoints_tmp, digest):
+                signature = file_signature(self.checkpoints_file)
+                if signature is not None:
+                    _CHECKPOINTS_CACHE[self.checkpoints_file] = (signature, data)
+                logger.info(f"Saved {len(data)} checkpoints for account {self.account_id}")
+            self._truncate_checkpoints_log()
             
-            data = {}
-            for chat_id, checkpoint in self.checkpoints.items():
-                checkpoint_dict = asdict(checkpoint)
-                # Convert any datetime fields to strings
-                for field, value in checkpoint_dict.items():
-                    if hasattr(value, 'isoformat'):
-                        checkpoint_dict[field] = value.isoformat()
-                data[str(chat_id)] = checkpoint_dict
-            
-            # Save locally
-            with open(self.checkpoints_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2, default=convert_datetime)
-            logger.info(f"Saved {len(self.checkpoints)} checkpoints for account {self.account_id}")
-            
-            # Backup to cloud
-            self.backup_to_cloud()
+            # Backup to cloud (debounced), reusing the digest of the bytes just encoded
+            self._schedule_cloud_backup((data, progress, groups, digest))
             
         except Exception as e:
             logger.error(f"Error saving checkpoints: {e}")
+    
+    def _schedule_cloud_backup(self, snapshot):
+        """Back up the newest snapshot once CLOUD_BACKUP_DEBOUNCE seconds pass, so a burst of saves uploads once"""
+        with self._write_lock:
+            self._pending_cloud = snapshot
+            if self._cloud_timer is not None:
+                return
+            # Daemon, so a waiting timer never holds the process open; flush() uploads what it would have
+            self._cloud_timer = threading.Timer(CLOUD_BACKUP_DEBOUNCE, self._submit_upload, (self._flush_cloud_backup,))
+            self._cloud_timer.daemon = True
+            try:
+                self._cloud_timer.start()
+            except RuntimeError:
+                # No new threads at interpreter shutdown; the exit flush uploads the pending snapshot
+                self._cloud_timer = None
+    
+    def _queue_cloud_backup(self):
+        """Schedule a debounced cloud backup of the current state (unchanged parts are skipped on upload)"""
+        self._schedule_cloud_backup((self._serialize_all(), self.get_progress(), dict(self.groups_cache), None))
+    
+    def _cancel_cloud_backup(self):
+        """Drop a pending debounced backup (the caller uploads current data itself, or it is obsolete)"""
+        with self._write_lock:
+            timer, self._cloud_timer = self._cloud_timer, None
+            self._pending_cloud = None
+        if timer is not None:
+            timer.cancel()
+    
+    def _flush_cloud_backup(self):
+        """Upload the pending debounced snapshot now (upload thread)"""
+        with self._write_lock:
+            snapshot, self._pending_cloud = self._pending_cloud, None
+            timer, self._cloud_timer = self._cloud_timer, None
+        if timer is not None:
+            timer.cancel()
+        if snapshot is not None:
+            self.backup_to_cloud(*snapshot)
 
     def load_groups_cache(self):
         """Load cached group list from disk"""
-        # Try the new format first
-        if os.path.exists(self.groups_cache_file):
-            try:
-                with open(self.groups_cache_file, 'r', encoding='utf-8') as fh:
-                    data = json.load(fh)
-                    if isinstance(data, dict):
-                        self.groups_cache = {
-                            'groups': data.get('groups', []),
-                            'updated_at': data.get('updated_at'),
-                            'owner_id': data.get('owner_id')
-                        }
-                logger.info(f"Loaded cached group list for account {self.account_id} ({len(self.groups_cache.get('groups', []))} groups)")
-                return
-            except Exception as exc:
-                logger.error(f"Error loading group cache for {self.account_id}: {exc}")
-        
-        # Try the old format
-        if os.path.exists(self.groups_cache_file_alt):
+        # Try the new format first, then the old one for backward compatibility
+        for path, label in ((self.groups_cache_file, ''), (self.groups_cache_file_alt, ' from old format')):
+            if not os.path.exists(path):
+                continue
             try:
-                with open(self.groups_cache_file_alt, 'r', encoding='utf-8') as fh:
-                    data = json.load(fh)
-                    if isinstance(data, dict):
-                        self.groups_cache = {
-                            'groups': data.get('groups', []),
-                            'updated_at': data.get('updated_at'),
-                            'owner_id': data.get('owner_id')
-                        }
-                logger.info(f"Loaded cached group list for account {self.account_id} from old format ({len(self.groups_cache.get('groups', []))} groups)")
+                data = json_loads(Path(path).read_bytes())
+                if isinstance(data, dict):
+                    self.groups_cache = {
+                        'groups': data.get('groups', []),
+                        'updated_at': data.get('updated_at'),
+                        'owner_id': data.get('owner_id')
+                    }
+                logger.info(f"Loaded cached group list for account {self.account_id}{label} ({len(self.groups_cache.get('groups', []))} groups)")
                 return
             except Exception as exc:
-                logger.error(f"Error loading group cache for {self.account_id} from old format: {exc}")
+                logger.error(f"Error loading group cache for {self.account_id}{label}: {exc}")
         
         # If neither file exists or both failed, initialize empty cache
         self.groups_cache = {
@@ -199,9 +587,8 @@ class CheckpointManager:
     def save_groups_cache(self):
         """Persist cached group list to disk"""
         try:
-            os.makedirs(os.path.dirname(self.groups_cache_file), exist_ok=True)
-            with open(self.groups_cache_file, 'w', encoding='utf-8') as fh:
-                json.dump(self.groups_cache, fh, ensure_ascii=False, indent=2)
+            ensure_dir(self._sessions_dir)
+            write_if_changed(self.groups_cache_file, json_dumps(self.groups_cache))
         except Exception as exc:
             logger.error(f"Error saving group cache for {self.account_id}: {exc}")
 
@@ -215,18 +602,16 @@ class CheckpointManager:
     def _load_meta(self):
         if os.path.exists(self.meta_file):
             try:
-                with open(self.meta_file, 'r', encoding='utf-8') as fh:
-                    data = json.load(fh)
-                    if isinstance(data, dict):
-                        self.meta.update(data)
+                data = json_loads(Path(self.meta_file).read_bytes())
+                if isinstance(data, dict):
+                    self.meta.update(data)
             except Exception as exc:
                 logger.error(f"Error loading account meta for {self.account_id}: {exc}")
 
     def _save_meta(self):
         try:
-            os.makedirs(os.path.dirname(self.meta_file), exist_ok=True)
-            with open(self.meta_file, 'w', encoding='utf-8') as fh:
-                json.dump(self.meta, fh, ensure_ascii=False, indent=2)
+            ensure_dir(self._sessions_dir)
+            write_if_changed(self.meta_file, json_dumps(self.meta))
         except Exception as exc:
             logger.error(f"Error saving account meta for {self.account_id}: {exc}")
 
@@ -242,8 +627,7 @@ class CheckpointManager:
     def _reset_for_new_owner(self, owner_id: int):
         logger.info(f"Owner change detected for {self.account_id}. Resetting local state.")
         self.meta['owner_id'] = owner_id
-        self.meta['updated_at'] = datetime.utcnow().isoformat()
-        self._save_meta()
+        self.meta['updated_at'] = _utcnow_iso()
 
         self.checkpoints = {}
         self.current_progress = {
@@ -252,7 +636,6 @@ class CheckpointManager:
             'current_index': 0,
             'scanned_chats': []
         }
-        self.save_checkpoints()
 
         self.groups_cache = {
             'groups': [],
@@ -266,12 +649,11 @@ class CheckpointManager:
         except Exception as exc:
             logger.warning(f"Failed to reset group store for {self.account_id}: {exc}")
 
-        try:
-            storage = self._get_cloud_storage()
-            if storage and getattr(storage, 'backup_enabled', False):
-                storage.backup_groups(self.account_id, self.groups_cache)
-        except Exception as exc:
-            logger.warning(f"Failed to backup group cache after owner reset for {self.account_id}: {exc}")
+        # One snapshot write, and one cloud bundle, covering checkpoints, progress and the emptied group list
+        self.save_checkpoints()
+        # The new owner is recorded last, after that snapshot on the writer thread, so a reset
+        # interrupted midway is simply redone on the next start
+        self._submit_write(self._save_meta)
 
     def list_persisted_groups(self):
         try:
@@ -303,7 +685,7 @@ class CheckpointManager:
 
     def update_groups_cache(self, groups, owner_id: Optional[int] = None):
         try:
-            updated_at = datetime.utcnow().isoformat()
+            updated_at = _utcnow_iso()
             self.groups_cache = {
                 'groups': groups,
                 'updated_at': updated_at,
@@ -315,9 +697,7 @@ class CheckpointManager:
                 self.group_store.set_synced_at(updated_at)
             except Exception as exc:
                 logger.error(f"Failed to sync group store for {self.account_id}: {exc}")
-            storage = self._get_cloud_storage()
-            if storage and getattr(storage, 'backup_enabled', False):
-                storage.backup_groups(self.account_id, self.groups_cache)
+            self._queue_cloud_backup()
         except Exception as exc:
             logger.error(f"Error updating group cache for {self.account_id}: {exc}")
     
@@ -336,29 +716,76 @@ class CheckpointManager:
             chat_id=chat_id,
             chat_title=chat_title,
             last_message_id=last_message_id,
-            last_scan_date=datetime.now().isoformat(),
+            last_scan_date=_now_iso(),
             messages_deleted=messages_deleted,
             total_messages_found=total_messages_found
         )
-        self.save_checkpoints()
+        self._checkpoint_changed(chat_id)
+    
+    def _checkpoint_changed(self, chat_id: int):
+        """Journal a changed checkpoint and save the full file once enough updates or time accumulate"""
+        checkpoint_data = _checkpoint_to_dict(self.checkpoints[chat_id])
+        if self._serialized is not None:
+            self._serialized[str(chat_id)] = checkpoint_data
+        self._append_checkpoints_log(checkpoint_data)
+        self._dirty_count += 1
+        if (self._dirty_count >= CHECKPOINT_FLUSH_EVERY
+                or time.monotonic() - self._last_flush > CHECKPOINT_FLUSH_INTERVAL):
+            self.save_checkpoints()
+    
+    def flush(self, upload: bool = True, wait: bool = True):
+        """Persist checkpoint updates that are still waiting for a batched save, wait for the write,
+        and upload the pending debounced cloud backup now instead of when its timer fires.
+        With wait=False only the save is queued (the snapshot is taken on the calling thread)."""
+        if self._dirty_count:
+            self.save_checkpoints()
+        if not wait:
+            return
+        self.wait_for_writes()
+        if upload:
+            self._submit_upload(self._flush_cloud_backup).result()
+    
+    def get_all_checkpoints(self) -> Mapping[int, ChatCheckpoint]:
+        """Get all checkpoints (a read-only live view, no copy)"""
+        return MappingProxyType(self.checkpoints)
     
-    def get_all_checkpoints(self) -> Dict[int, ChatCheckpoint]:
-        """Get all checkpoints"""
-        return self.checkpoints.copy()
+    def _scanned_chats_index(self) -> Dict[Any, int]:
+        """Chat id -> position in scanned_chats, rebuilt when the list was replaced or resized elsewhere"""
+        chats = self.current_progress.setdefault('scanned_chats', [])
+        if chats is not self._indexed_chats or len(chats) != self._indexed_len:
+            self._chat_positions = {chat.get('id'): i for i, chat in enumerate(chats)}
+            self._indexed_chats = chats
+            self._indexed_len = len(chats)
+        return self._chat_positions
+    
+    def _find_scanned_chat(self, chat_id) -> Optional[int]:
+        """Position of chat_id in scanned_chats, or None"""
+        position = self._scanned_chats_index().get(chat_id)
+        if position is not None and self._indexed_chats[position].get('id') != chat_id:
+            # Entries were reordered in place; reindex once
+            self._indexed_chats = None
+            position = self._scanned_chats_index().get(chat_id)
+        return position
+    
+    def _append_scanned_chat(self, chat: Dict):
+        chats = self.current_progress['scanned_chats']
+        chats.append(chat)
+        if chats is self._indexed_chats:
+            self._chat_positions[chat.get('id')] = len(chats) - 1
+            self._indexed_len = len(chats)
     
     def update_progress(self, **kwargs):
         """Update current scan progress"""
         if 'scanned_chats' in kwargs:
             # Append to existing scanned_chats instead of replacing
-            existing_chats = self.current_progress.get('scanned_chats', [])
+            existing_ids = self._scanned_chats_index()
             new_chats = kwargs['scanned_chats']
             if isinstance(new_chats, list):
                 # Merge new chats with existing ones, avoiding duplicates
-                existing_ids = {chat.get('id') for chat in existing_chats}
                 for chat in new_chats:
                     if chat.get('id') not in existing_ids:
-                        existing_chats.append(chat)
-                kwargs['scanned_chats'] = existing_chats
+                        self._append_scanned_chat(chat)
+                kwargs['scanned_chats'] = self.current_progress['scanned_chats']
         
         # Update current_chat_id if current_chat is provided
         if 'current_chat' in kwargs and 'current_chat_id' not in kwargs:
@@ -374,22 +801,27 @@ class CheckpointManager:
             self.current_progress['messages_found'] = kwargs['messages_found']
         
         self.current_progress.update(kwargs)
+        self._progress_version += 1
     
     def get_progress(self) -> Dict:
-        """Get current scan progress"""
-        return self.current_progress.copy()
+        """Get current scan progress (scanned_chats is a snapshot list shared until the progress changes)"""
+        chats = self.current_progress.get('scanned_chats')
+        key = (self._progress_version, id(chats), len(chats) if isinstance(chats, list) else 0)
+        if key != self._progress_snapshot_key:
+            snapshot = dict(self.current_progress)
+            if isinstance(chats, list):
+                snapshot['scanned_chats'] = list(chats)
+            self._progress_snapshot = snapshot
+            self._progress_snapshot_key = key
+        return dict(self._progress_snapshot)
     
     def reset_all_data(self):
         """Reset all scan data and checkpoints but keep findings"""
         # Reset scan memory but keep findings (History)
-        for chat_id, checkpoint in self.checkpoints.items():
-            checkpoint.last_scan_date = None
-            checkpoint.last_message_id = None
-            checkpoint.scan_state = 'idle'
-            checkpoint.total_estimate = None
-            checkpoint.scanned_count = 0
-            checkpoint.has_unscanned_dates = False
-            # Keep: messages_deleted, total_messages_found (History)
+        for checkpoint in self.checkpoints.values():
+            for name, value in _RESET_TEMPLATE:
+                setattr(checkpoint, name, value)
+        self._serialized = None
         
         # שמירה על הממצאים הקיימים - לא למחוק את scanned_chats!
         existing_scanned_chats = self.current_progress.get('scanned_chats', [])
@@ -407,6 +839,11 @@ class CheckpointManager:
         """Clear all scan cache and checkpoints but keep session/auth data"""
         # Clear checkpoints
         self.checkpoints = {}
+        self._dirty_count = 0
+        with self._write_lock:
+            self._pending_snapshot = None
+        self.wait_for_writes()
+        self._cancel_cloud_backup()
         
         # Clear scan progress
         self.current_progress = {
@@ -428,8 +865,10 @@ class CheckpointManager:
             if os.path.exists(self.checkpoints_file):
                 os.remove(self.checkpoints_file)
                 logger.info(f"Deleted checkpoints file: {self.checkpoints_file}")
+            _CHECKPOINTS_CACHE.pop(self.checkpoints_file, None)
         except Exception as e:
             logger.error(f"Error deleting checkpoints file: {e}")
+        self._truncate_checkpoints_log()
         
         # Clear groups cache scan data but keep groups list
         # Keep groups list but reset scan-related fields
@@ -474,18 +913,20 @@ class CheckpointManager:
                            group_rules: str = '', last_sent_at: Optional[str] = None,
                            send_status: Optional[str] = None, send_error: Optional[str] = None):
         """Update progress for current chat"""
-        self.current_progress['current_chat'] = chat_title
-        self.current_progress['chat_id'] = chat_id
-        self.current_progress['status'] = status
+        # Hot per-chat path: property-backed state is bound to locals once
+        progress = self.current_progress
+        progress['current_chat'] = chat_title
+        progress['chat_id'] = chat_id
+        progress['status'] = status
+        self._progress_version += 1
         
         # Add to scanned chats if completed
-        if status in ['completed', 'skipped', 'error']:
+        if status in _STATUS_COUNTERS:
             # Find existing chat to preserve messages if they exist
-            existing_chat = None
-            for chat in self.current_progress['scanned_chats']:
-                if chat['id'] == chat_id:
-                    existing_chat = chat
-                    break
+            scanned_chats = progress['scanned_chats']
+            position = self._find_scanned_chat(chat_id)
+            existing_chat = scanned_chats[position] if position is not None else _NO_CHAT
+            existing_get = existing_chat.get
             
             scanned_chat = {
                 'id': chat_id,
@@ -494,42 +935,40 @@ class CheckpointManager:
                 'messages_found': messages_found,
                 'error': error,
                 'skipped_reason': skipped_reason,
-                'messages': messages or (existing_chat.get('messages', []) if existing_chat else []),
-                'messages_deleted': existing_chat.get('messages_deleted', 0) if existing_chat else 0,
-                'last_scan_date': last_scan_date or (existing_chat.get('last_scan_date') if existing_chat else None),
-                'member_count': existing_chat.get('member_count', 0) if existing_chat else 0,
-                'group_rules': group_rules or (existing_chat.get('group_rules') if existing_chat else ''),
-                'last_sent_at': last_sent_at or (existing_chat.get('last_sent_at') if existing_chat else None),
-                'send_status': send_status or (existing_chat.get('send_status') if existing_chat else None),
-                'send_error': send_error or (existing_chat.get('send_error') if existing_chat else None)
+                'messages': messages or existing_get('messages', []),
+                'messages_deleted': existing_get('messages_deleted', 0),
+                'last_scan_date': last_scan_date or existing_get('last_scan_date'),
+                'member_count': existing_get('member_count', 0),
+                'group_rules': group_rules or existing_get('group_rules'),
+                'last_sent_at': last_sent_at or existing_get('last_sent_at'),
+                'send_status': send_status or existing_get('send_status'),
+                'send_error': send_error or existing_get('send_error')
             }
             
-            # Remove existing entry if exists
-            self.current_progress['scanned_chats'] = [
-                chat for chat in self.current_progress['scanned_chats'] 
-                if chat['id'] != chat_id
-            ]
-            
-            # Add new entry
-            self.current_progress['scanned_chats'].append(scanned_chat)
+            # Replace the existing entry in place, or add a new one
+            if position is not None:
+                scanned_chats[position] = scanned_chat
+            else:
+                self._append_scanned_chat(scanned_chat)
             
-            # Update counters
-            if status == 'completed':
-                self.current_progress['completed'] += 1
-                self.current_progress['total_messages'] += messages_found
-            elif status == 'skipped':
-                self.current_progress['skipped'] += 1
-            elif status == 'error':
-                self.current_progress['errors'] += 1
+            # Update counters, moving a re-reported chat out of the bucket it was counted in before
+            counted_chats = self._counted_chats
+            previous = counted_chats.get(chat_id)
+            if previous is not None:
+                self._bump_progress_counters(*previous, sign=-1)
+            self._bump_progress_counters(status, messages_found)
+            counted_chats[chat_id] = (status, messages_found)
             
-            self.current_progress['current_index'] += 1
+            progress['current_index'] = progress.get('current_index', 0) + 1
             
             # Update checkpoint with last scan date if provided
             if last_scan_date and status == 'completed':
-                if chat_id in self.checkpoints:
-                    self.checkpoints[chat_id].last_scan_date = last_scan_date
+                checkpoints = self.checkpoints
+                checkpoint = checkpoints.get(chat_id)
+                if checkpoint is not None:
+                    checkpoint.last_scan_date = last_scan_date
                 else:
-                    self.checkpoints[chat_id] = ChatCheckpoint(
+                    checkpoints[chat_id] = ChatCheckpoint(
                         chat_id=chat_id,
                         chat_title=chat_title,
                         last_message_id=None,
@@ -537,53 +976,75 @@ class CheckpointManager:
                         messages_deleted=0,
                         total_messages_found=messages_found
                     )
-                self.save_checkpoints()
+                self._checkpoint_changed(chat_id)
+    
+    def _bump_progress_counters(self, status: str, messages_found: int, sign: int = 1):
+        progress = self.current_progress
+        key = _STATUS_COUNTERS[status]
+        progress[key] = progress.get(key, 0) + sign
+        if status == 'completed':
+            progress['total_messages'] = progress.get('total_messages', 0) + sign * messages_found
     
     def finish_scan(self):
         """Mark scan as finished"""
         self.current_progress['status'] = 'completed'
-        self.auto_backup()
+        self._progress_version += 1
+        self.flush(upload=False)
+        # Upload and prune on the upload thread; the final checkpoints write has completed above
+        snapshot = (self._serialize_all(), self.get_progress(), dict(self.groups_cache))
+        self._submit_upload(self.auto_backup, snapshot)
     
     def get_current_progress(self):
         """Get current scan progress"""
-        return self.current_progress.copy()
+        return self.get_progress()
+    
+    def _backup_if_changed(self, kind: str, upload, payload: Dict, force: bool = False,
+                           digest: Optional[bytes] = None):
+        """Upload payload unless the last successful upload of this kind had identical content"""
+        if digest is None:
+            digest = payload_digest(json_dumps(payload, default=str))
+        if not force and self._backup_digests.get(kind) == digest:
+            logger.debug(f"Skipping unchanged {kind} backup for account {self.account_id}")
+            return
+        if upload(self.account_id, payload):
+            self._backup_digests[kind] = digest
     
-    def backup_to_cloud(self):
-        """Backup current data to cloud storage"""
+    def backup_to_cloud(self, checkpoints_data: Optional[Dict[str, Dict]] = None,
+                        scan_data: Optional[Dict] = None, groups: Optional[Dict] = None,
+                        checkpoints_digest: Optional[bytes] = None, force: bool = False):
+        """Backup current data (or the given snapshot of it) to cloud storage as one bundle"""
         try:
-            # Convert checkpoints to serializable format
-            checkpoints_data = {}
-            for chat_id, checkpoint in self.checkpoints.items():
-                checkpoint_dict = asdict(checkpoint)
-                # Convert datetime fields to strings
-                for field, value in checkpoint_dict.items():
-                    if hasattr(value, 'isoformat'):
-                        checkpoint_dict[field] = value.isoformat()
-                checkpoints_data[str(chat_id)] = checkpoint_dict
-            
-            # Backup checkpoints
-            self._get_cloud_storage().backup_checkpoints(self.account_id, checkpoints_data)
-            
-            # Backup scan progress
-            self._get_cloud_storage().backup_scan_data(self.account_id, self.current_progress)
-
-            # Backup cached group list
-            self._get_cloud_storage().backup_groups(self.account_id, self.groups_cache)
+            if checkpoints_data is None:
+                checkpoints_data = self._serialize_all()
+            bundle = {
+                'checkpoints': checkpoints_data,
+                'scan_data': scan_data if scan_data is not None else self.get_progress(),
+                'groups': groups if groups is not None else self.groups_cache
+            }
+            # Reuse the checkpoints digest when given, so only the small progress/groups part is encoded here
+            if checkpoints_digest is None:
+                checkpoints_digest = payload_digest(json_dumps(checkpoints_data))
+            digest = payload_digest(checkpoints_digest + json_dumps(
+                {'scan_data': bundle['scan_data'], 'groups': bundle['groups']}, default=str))
+            self._backup_if_changed('bundle', self._get_cloud_storage().backup_bundle, bundle, force, digest)
             
             logger.info(f"Successfully backed up data for account {self.account_id}")
             
         except Exception as e:
             logger.error(f"Error backing up to cloud: {e}")
     
-    def auto_backup(self) -> bool:
-        """Ensure scan data is synced to cloud and prune old backups"""
+    def auto_backup(self, snapshot: Optional[Tuple[Dict, Dict, Dict]] = None) -> bool:
+        """Ensure scan data (current, or the given snapshot) is synced to cloud and prune old backups"""
         try:
             storage = self._get_cloud_storage()
             if not storage or not storage.backup_enabled:
                 logger.debug("Cloud backup not enabled; skipping auto backup")
                 return False
             
-            self.backup_to_cloud()
+            # Uploads current data, which supersedes any debounced snapshot. Always upload here,
+            # even if unchanged, so pruning below never leaves the account without a recent backup
+            self._cancel_cloud_backup()
+            self.backup_to_cloud(*(snapshot or ()), force=True)
             retention_days = max(1, self.backup_retention_days)
             storage.prune_old_backups(self.account_id, retention_days)
             return True
@@ -602,37 +1063,40 @@ class CheckpointManager:
                 logger.info(f"Local checkpoints and scanned chats exist for account {self.account_id}, skipping cloud restore")
                 return
             
-            # Try to restore checkpoints from cloud
-            cloud_checkpoints = self._get_cloud_storage().restore_latest_data(self.account_id, 'checkpoints')
+            # Current backups are a single bundle; accounts backed up before that have one file per type
+            storage = self._get_cloud_storage()
+            bundle = storage.restore_latest_data(self.account_id, 'bundle')
+            if isinstance(bundle, dict):
+                cloud_checkpoints = bundle.get('checkpoints')
+                cloud_scan_data = bundle.get('scan_data')
+                cloud_groups = bundle.get('groups')
+            else:
+                cloud_checkpoints = storage.restore_latest_data(self.account_id, 'checkpoints')
+                cloud_scan_data = storage.restore_latest_data(self.account_id, 'scan_data')
+                cloud_groups = None
+            
             if cloud_checkpoints:
                 # Convert back to ChatCheckpoint objects
-                restored_checkpoints = {}
-                for chat_id_str, checkpoint_data in cloud_checkpoints.items():
-                    try:
-                        chat_id = int(chat_id_str)
-                        restored_checkpoints[chat_id] = ChatCheckpoint(**checkpoint_data)
-                    except Exception as e:
-                        logger.warning(f"Failed to restore checkpoint for chat {chat_id_str}: {e}")
+                restored_checkpoints = _checkpoints_from_data(cloud_checkpoints)
                 
                 if restored_checkpoints:
                     self.checkpoints = restored_checkpoints
                     logger.info(f"Restored {len(restored_checkpoints)} checkpoints from cloud for account {self.account_id}")
             
-            # Try to restore scan data from cloud
-            cloud_scan_data = self._get_cloud_storage().restore_latest_data(self.account_id, 'scan_data')
             if cloud_scan_data:
                 # Merge with current progress, preserving scanned_chats
-                existing_scanned_chats = self.current_progress.get('scanned_chats', [])
+                existing_ids = self._scanned_chats_index()
+                existing_scanned_chats = self.current_progress['scanned_chats']
                 cloud_scanned_chats = cloud_scan_data.get('scanned_chats', [])
                 
-                # Merge scanned chats, avoiding duplicates
-                existing_ids = {chat.get('id') for chat in existing_scanned_chats}
+                # Merge scanned chats, avoiding duplicates (the id index is kept up to date as chats are added)
                 for chat in cloud_scanned_chats:
                     if chat.get('id') not in existing_ids:
-                        existing_scanned_chats.append(chat)
+                        self._append_scanned_chat(chat)
                 
                 self.current_progress.update(cloud_scan_data)
                 self.current_progress['scanned_chats'] = existing_scanned_chats
+                self._progress_version += 1
                 
                 logger.info(f"Restored scan data from cloud for account {self.account_id}")
             
@@ -642,7 +1106,8 @@ class CheckpointManager:
             
             # Restore cached group list if we don't have one locally
             if not self.groups_cache.get('groups'):
-                cloud_groups = self._get_cloud_storage().restore_latest_data(self.account_id, 'groups')
+                if not isinstance(bundle, dict):
+                    cloud_groups = storage.restore_latest_data(self.account_id, 'groups')
                 if isinstance(cloud_groups, dict) and cloud_groups.get('groups') is not None:
                     self.groups_cache = {
                         'groups': cloud_groups.get('groups', []),
@@ -657,7 +1122,8 @@ class CheckpointManager:
     def force_sync_to_cloud(self):
         """Force sync all current data to cloud storage"""
         try:
-            success = self.auto_backup()
+            self.flush(upload=False)
+            success = self._submit_upload(self.auto_backup).result()
             if success:
                 logger.info(f"Force sync completed for account {self.account_id}")
             else:
@@ -678,35 +1144,134 @@ class CheckpointManager:
             logger.error(f"Error getting backup info: {e}")
             return {'backup_count': 0, 'latest_backup': None, 'all_backups': []}
     
+    def _temporary_db(self) -> sqlite3.Connection:
+        """Connection to the temporary messages database, opened (and the table created) on first use (call with _temporary_lock held)"""
+        if self._temporary_conn is None:
+            ensure_dir(self._sessions_dir)
+            conn = sqlite3.connect(self.temporary_messages_db, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_TEMPORARY_MESSAGES_SCHEMA)
+            self._temporary_conn = conn
+        return self._temporary_conn
+    
     def load_temporary_messages(self):
-        """Load temporary messages from file"""
-        if os.path.exists(self.temporary_messages_file):
-            try:
-                with open(self.temporary_messages_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.temporary_messages = data if isinstance(data, dict) else {}
-                logger.info(f"Loaded {len(self.temporary_messages)} temporary messages for account {self.account_id}")
-            except Exception as e:
-                logger.error(f"Error loading temporary messages: {e}")
-                self.temporary_messages = {}
-        else:
+        """Load temporary messages from the database (importing the old JSON file the first time)"""
+        self.temporary_messages = {}
+        try:
+            rows = []
+            # Accounts without temporary messages never get a database file
+            if os.path.exists(self.temporary_messages_db):
+                with self._temporary_lock:
+                    rows = self._temporary_db().execute(
+                        "SELECT key, account_id, chat_id, chat_title, message_id, sent_at, deletes_at, deleted "
+                        "FROM temporary_messages ORDER BY rowid"
+                    ).fetchall()
+            for row in rows:
+                msg_data = {'key': row[0], **dict(zip(_TEMPORARY_MESSAGE_FIELDS, row[1:7])), 'deleted': bool(row[7])}
+                self.temporary_messages[row[0]] = msg_data
+            if not rows and os.path.exists(self.temporary_messages_file):
+                self._migrate_temporary_messages_json()
+            logger.info(f"Loaded {len(self.temporary_messages)} temporary messages for account {self.account_id}")
+        except Exception as e:
+            logger.error(f"Error loading temporary messages: {e}")
             self.temporary_messages = {}
+        self._rebuild_expiry_heap()
+    
+    def _migrate_temporary_messages_json(self):
+        """Copy the old JSON store into the database, then set the JSON file aside"""
+        data = json_loads(Path(self.temporary_messages_file).read_bytes())
+        if isinstance(data, dict):
+            # Records carry their own key (older files lack it), so the getters can hand them out as-is
+            for message_key, msg_data in data.items():
+                msg_data['key'] = message_key
+            self.temporary_messages = data
+            self._rebuild_expiry_heap()
+            self._write_temporary_rows(list(data))
+        os.replace(self.temporary_messages_file, f"{self.temporary_messages_file}.migrated")
+        logger.info(f"Migrated {len(self.temporary_messages)} temporary messages for account {self.account_id} to SQLite")
     
-    def save_temporary_messages(self):
-        """Save temporary messages to file"""
+    def _expiry_epoch(self, message_key: str, msg_data: Dict[str, Any]) -> Optional[float]:
+        """deletes_at of a pending temporary message as epoch seconds, or None if it is deleted or has no usable deletes_at"""
+        deletes_at_str = msg_data.get('deletes_at')
+        if msg_data.get('deleted', False) or not deletes_at_str:
+            return None
         try:
-            os.makedirs(os.path.dirname(self.temporary_messages_file), exist_ok=True)
-            with open(self.temporary_messages_file, 'w', encoding='utf-8') as f:
-                json.dump(self.temporary_messages, f, ensure_ascii=False, indent=2)
+            return _deletes_at_utc(deletes_at_str).timestamp()
+        except Exception as e:
+            logger.warning(f"Error checking expiration for temporary message {message_key}: {e}")
+            return None
+    
+    def _rebuild_expiry_heap(self):
+        epochs = {}
+        for key, msg in self.temporary_messages.items():
+            epoch = self._expiry_epoch(key, msg)
+            if epoch is not None:
+                epochs[key] = epoch
+        heap = [(epoch, key) for key, epoch in epochs.items()]
+        heapq.heapify(heap)
+        self._expiry_epochs = epochs
+        self._expiry_heap = heap
+        self._expired_keys = {}
+    
+    def save_temporary_messages(self, message_keys: Optional[Iterable[str]] = None):
+        """Queue a write of the given temporary messages (default: all) on the writer thread; keys changed before it runs are written together"""
+        keys = self.temporary_messages.keys() if message_keys is None else message_keys
+        with self._write_lock:
+            queued = bool(self._temporary_dirty)
+            self._temporary_dirty.update(keys)
+            submit = not queued and bool(self._temporary_dirty)
+        if submit:
+            self._submit_write(self._write_temporary_messages)
+    
+    def _write_temporary_messages(self):
+        """Write the temporary messages changed since the last write to the database (writer thread)"""
+        with self._write_lock:
+            keys, self._temporary_dirty = self._temporary_dirty, set()
+        try:
+            self._write_temporary_rows(keys)
         except Exception as e:
             logger.error(f"Error saving temporary messages: {e}")
     
-    def add_temporary_message(self, chat_id: int, chat_title: str, message_id: int, sent_at: str):
-        """Add a temporary message that should be deleted after 1 hour"""
+    def _write_temporary_rows(self, keys: Iterable[str]):
+        """Upsert the given temporary messages, and delete the rows of removed ones, in one transaction"""
+        messages = self.temporary_messages
+        epochs = self._expiry_epochs
+        upserts = []
+        deletes = []
+        for key in keys:
+            msg_data = messages.get(key)
+            if msg_data is None:
+                deletes.append((key,))
+                continue
+            upserts.append((key, *(msg_data.get(field) for field in _TEMPORARY_MESSAGE_FIELDS),
+                            epochs.get(key), 1 if msg_data.get('deleted', False) else 0))
+        with self._temporary_lock:
+            conn = self._temporary_db()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO temporary_messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", upserts)
+                conn.executemany("DELETE FROM temporary_messages WHERE key = ?", deletes)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def add_temporary_message(self, chat_id: int, chat_title: str, message_id: int, sent_at: Union[str, datetime]):
+        """Add a temporary message that should be deleted after 1 hour (sent_at as datetime or ISO string)"""
         message_key = f"{chat_id}_{message_id}"
-        deletes_at = (datetime.fromisoformat(sent_at.replace('Z', '+00:00')) + timedelta(hours=1)).isoformat()
+        if isinstance(sent_at, datetime):
+            sent_dt = sent_at
+            sent_at = sent_dt.isoformat()
+        else:
+            sent_dt = datetime.fromisoformat(sent_at.replace('Z', '+00:00'))
+        deletes_dt = sent_dt + timedelta(hours=1)
+        deletes_at = deletes_dt.isoformat()
+        # Naive times are UTC, as in _deletes_at_utc
+        epoch = (deletes_dt if deletes_dt.tzinfo else deletes_dt.replace(tzinfo=timezone.utc)).timestamp()
         
         self.temporary_messages[message_key] = {
+            'key': message_key,
             'account_id': self.account_id,
             'chat_id': chat_id,
             'chat_title': chat_title,
@@ -715,73 +1280,76 @@ class CheckpointManager:
             'deletes_at': deletes_at,
             'deleted': False
         }
-        self.save_temporary_messages()
+        self._expired_keys.pop(message_key, None)
+        self._expiry_epochs[message_key] = epoch
+        heapq.heappush(self._expiry_heap, (epoch, message_key))
+        # Entries of removed/deleted/re-added messages stay in the heap until popped; drop them if they pile up
+        if len(self._expiry_heap) > 2 * len(self.temporary_messages) + 64:
+            self._rebuild_expiry_heap()
+        self.save_temporary_messages((message_key,))
         logger.info(f"Added temporary message {message_id} in chat {chat_id} ({chat_title}), will delete at {deletes_at}")
     
     def get_expired_temporary_messages(self) -> list:
-        """Get list of temporary messages that should be deleted (expired more than 1 hour ago)"""
-        now = datetime.now(timezone.utc)
+        """Get list of temporary messages that should be deleted (expired more than 1 hour ago); the stored records themselves, do not modify"""
+        heap = self._expiry_heap
+        expired_keys = self._expired_keys
+        epochs = self._expiry_epochs
+        # Nothing pending (no messages, or all deleted): whatever is left in the heap is stale
+        if not epochs:
+            heap.clear()
+            expired_keys.clear()
+            return []
+        now = time.time()
+        # Only entries that expired since the last call come off the heap
+        while heap and heap[0][0] <= now:
+            epoch, message_key = heapq.heappop(heap)
+            # Skip stale entries: removed, marked deleted, or re-added with another expiry since the push
+            if epochs.get(message_key) == epoch:
+                expired_keys[message_key] = None
+        
         expired = []
-        for message_key, msg_data in self.temporary_messages.items():
-            if msg_data.get('deleted', False):
+        for message_key in list(expired_keys):
+            msg_data = self.temporary_messages.get(message_key)
+            if msg_data is None or msg_data.get('deleted', False):
+                del expired_keys[message_key]
                 continue
-            try:
-                deletes_at_str = msg_data.get('deletes_at')
-                if not deletes_at_str:
-                    continue
-                # Handle both with and without timezone
-                deletes_at = datetime.fromisoformat(deletes_at_str.replace('Z', '+00:00'))
-                if deletes_at.tzinfo is None:
-                    deletes_at = deletes_at.replace(tzinfo=timezone.utc)
-                else:
-                    deletes_at = deletes_at.astimezone(timezone.utc)
-                
-                if deletes_at <= now:
-                    expired.append({
-                        'key': message_key,
-                        **msg_data
-                    })
-            except Exception as e:
-                logger.warning(f"Error checking expiration for temporary message {message_key}: {e}")
+            expired.append(msg_data)
         return expired
     
     def get_active_temporary_messages(self) -> list:
         """Get list of all active temporary messages with time remaining"""
-        now = datetime.now(timezone.utc)
+        epochs = self._expiry_epochs
+        # Nothing pending (no messages, or all deleted): skip walking the stored ones
+        if not epochs:
+            return []
+        now = time.time()
         active = []
         for message_key, msg_data in self.temporary_messages.items():
-            if msg_data.get('deleted', False):
-                continue
-            try:
-                deletes_at_str = msg_data.get('deletes_at')
-                if not deletes_at_str:
-                    continue
-                deletes_at = datetime.fromisoformat(deletes_at_str.replace('Z', '+00:00'))
-                if deletes_at.tzinfo is None:
-                    deletes_at = deletes_at.replace(tzinfo=timezone.utc)
-                else:
-                    deletes_at = deletes_at.astimezone(timezone.utc)
-                
-                if deletes_at > now:
-                    time_remaining = deletes_at - now
-                    minutes_remaining = int(time_remaining.total_seconds() / 60)
-                    active.append({
-                        'key': message_key,
-                        'minutes_remaining': minutes_remaining,
-                        **msg_data
-                    })
-            except Exception as e:
-                logger.warning(f"Error calculating time remaining for temporary message {message_key}: {e}")
+            deletes_at = epochs.get(message_key)
+            if deletes_at is not None and deletes_at > now:
+                active.append({**msg_data, 'minutes_remaining': int((deletes_at - now) / 60)})
         return active
     
     def mark_temporary_message_deleted(self, message_key: str):
-        """Mark a temporary message as deleted"""
-        if message_key in self.temporary_messages:
-            self.temporary_messages[message_key]['deleted'] = True
-            self.save_temporary_messages()
+        """Mark a temporary message as deleted (legacy single-key form of mark_temporary_messages_deleted)"""
+        self.mark_temporary_messages_deleted((message_key,))
+    
+    def mark_temporary_messages_deleted(self, message_keys: Iterable[str]) -> int:
+        """Mark several temporary messages as deleted with a single save; returns how many were found"""
+        marked = []
+        for message_key in message_keys:
+            msg_data = self.temporary_messages.get(message_key)
+            if msg_data is not None:
+                msg_data['deleted'] = True
+                self._expiry_epochs.pop(message_key, None)
+                marked.append(message_key)
+        if marked:
+            self.save_temporary_messages(marked)
+        return len(marked)
     
     def remove_temporary_message(self, message_key: str):
         """Remove a temporary message from storage"""
         if message_key in self.temporary_messages:
             del self.temporary_messages[message_key]
-            self.save_temporary_messages()
+            self._expiry_epochs.pop(message_key, None)
+            self.save_temporary_messages((message_key,))
@@ -2,17 +2,66 @@ import json
 import os
 import requests
 import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 from dataclasses import asdict
 import hashlib
 import base64
+import gzip
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+from .file_utils import atomic_write_bytes, ensure_dir, json_dumps, payload_digest
 
 logger = logging.getLogger(__name__)
 
+
+def _legacy_hash_encoding(data: Any) -> bytes:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+
+def _blake2b_128(payload: bytes):
+    return hashlib.blake2b(payload, digest_size=16)
+
+
+# hash_alg -> (encoding of the data that gets hashed, hash constructor). 'blake2b-128' hashes compact sorted
+# JSON from orjson (about 10x faster to produce); 'blake2b' and 'md5' (envelopes without a hash_alg field)
+# hashed the stdlib's spaced sort_keys output
+_HASHERS = {
+    'blake2b-128': (lambda data: json_dumps(data, sort_keys=True), _blake2b_128),
+    'blake2b': (_legacy_hash_encoding, _blake2b_128),
+    'md5': (_legacy_hash_encoding, hashlib.md5),
+}
+# Integrity hash written into new backup envelopes as 'hash_alg'. Without orjson the stdlib's float formatting
+# differs from it, so those hosts keep writing 'blake2b'
+BACKUP_HASH_ALG = 'blake2b-128' if orjson is not None else 'blake2b'
+
+# {YYYYmmdd}_{HHMMSS} (plus the optional per-second counter) at the end of a backup filename
+_BACKUP_FILENAME_TS = re.compile(r'_(\d{8}_\d{6})(?:_\d+)?\.json(?:\.gz)?$')
+
+# Remote backup listings are reused for this many seconds (any backup or delete for the account drops them)
+LIST_CACHE_TTL = 30.0
+
+# Backup bodies smaller than this are uploaded as-is; gzip overhead outweighs the saving
+GZIP_MIN_BYTES = 1024
+
 class CloudStorageManager:
     """Manages cloud backup and restore of scan data and checkpoints"""
     
+    # (epoch second, its formatted timestamp, backups already named in that second)
+    _ts_cache: Tuple[int, str, int] = (0, '', 0)
+    _ts_lock = threading.Lock()
+    
     def __init__(self, cloud_endpoint: str = None, api_key: str = None):
         self.cloud_endpoint = cloud_endpoint or os.getenv('CLOUD_STORAGE_ENDPOINT')
         self.api_key = api_key or os.getenv('CLOUD_STORAGE_API_KEY')
@@ -22,138 +71,144 @@ class CloudStorageManager:
         if not self.backup_enabled:
             logger.warning("Cloud storage not configured. Data will only be stored locally.")
     
+    @cached_property
+    def http(self) -> requests.Session:
+        """Keep-alive HTTP session shared by this backend's requests (created on first use)"""
+        session = requests.Session()
+        # Connection errors and throttling/5xx responses are retried only for idempotent methods
+        # (urllib3's default), never uploads; after the last retry the response itself is returned
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                              max_retries=Retry(total=3, backoff_factor=0.2,
+                                                status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    @cached_property
+    def _list_cache(self) -> Dict[str, Tuple[float, List[Dict]]]:
+        """account id -> (monotonic time fetched, backups listed)"""
+        return {}
+    
+    def close(self):
+        """Close the HTTP session's pooled connections (a later request opens a new session)"""
+        session = self.__dict__.pop('http', None)
+        if session is not None:
+            session.close()
+    
     def _get_backup_filename(self, account_id: str, data_type: str) -> str:
-        """Generate backup filename for cloud storage"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"telegram_delete_backup_{account_id}_{data_type}_{timestamp}.json"
+        """Generate backup filename for cloud storage, unique even for several backups within one second"""
+        now_sec = int(time.time())
+        with self._ts_lock:
+            last_sec, timestamp, counter = self._ts_cache
+            if now_sec == last_sec:
+                counter += 1
+            else:
+                timestamp = datetime.fromtimestamp(now_sec).strftime("%Y%m%d_%H%M%S")
+                counter = 0
+            self._ts_cache = (now_sec, timestamp, counter)
+        # Zero-padded so names still sort chronologically
+        return f"telegram_delete_backup_{account_id}_{data_type}_{timestamp}_{counter:03d}.json"
     
-    def _calculate_hash(self, data: Dict) -> str:
+    def _calculate_hash(self, data: Dict, hash_alg: str = BACKUP_HASH_ALG) -> str:
         """Calculate hash of data for integrity checking"""
-        data_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(data_str.encode('utf-8')).hexdigest()
+        return self._serialize_and_hash(data, hash_alg)[1]
     
-    def backup_checkpoints(self, account_id: str, checkpoints: Dict) -> bool:
-        """Backup checkpoints to cloud storage"""
+    def _serialize_and_hash(self, data: Dict, hash_alg: str = BACKUP_HASH_ALG) -> Tuple[bytes, str]:
+        """Encode data the way _calculate_hash does and hash those same bytes"""
+        encode, hasher = _HASHERS[hash_alg]
+        encoded = encode(data)
+        return encoded, hasher(encoded).hexdigest()
+    
+    def _backup_timestamp(self) -> str:
+        return datetime.now().isoformat()
+    
+    def _backup_body(self, account_id: str, data_type: str, data: Dict) -> bytes:
+        """Backup envelope as JSON bytes, embedding the bytes that were hashed rather than encoding data again"""
+        encoded, data_hash = self._serialize_and_hash(data)
+        head = json_dumps({
+            'account_id': account_id,
+            'data_type': data_type,
+            'timestamp': self._backup_timestamp(),
+            'hash_alg': BACKUP_HASH_ALG
+        })
+        return b''.join((head[:-1], b',"data":', encoded, b',"hash":"', data_hash.encode('ascii'), b'"}'))
+    
+    def _body_hash(self, body: bytes) -> bytes:
+        """The data hash of an envelope built by _backup_body (its last field)"""
+        return body[body.rindex(b',"hash":"') + 9:-2]
+    
+    def _compress_body(self, body: bytes) -> Tuple[bytes, bool]:
+        """Gzip an encoded backup for upload unless it is too small to benefit"""
+        if len(body) < GZIP_MIN_BYTES:
+            return body, False
+        return gzip.compress(body, compresslevel=3), True
+    
+    def _decode_backup(self, raw) -> Dict:
+        """Parse a stored backup, undoing the gzip (or gzip+base64 text wrapper) it was stored with, if any"""
+        if raw[:2] == b'\x1f\x8b':
+            raw = gzip.decompress(raw)
+        backup_data = json.loads(raw)
+        if isinstance(backup_data, dict) and backup_data.get('encoding') == 'gzip+base64':
+            return json.loads(gzip.decompress(base64.b64decode(backup_data['data_b64'])))
+        return backup_data
+    
+    def _backup_data(self, account_id: str, data_type: str, data: Dict) -> bool:
+        """Encode one backup and hand it to the backend's _store_backup"""
         if not self.backup_enabled:
             return False
-            
+        
         try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'checkpoints',
-                'timestamp': datetime.now().isoformat(),
-                'data': checkpoints,
-                'hash': self._calculate_hash(checkpoints)
-            }
-            
-            filename = self._get_backup_filename(account_id, 'checkpoints')
-            
-            # Upload to cloud storage
-            response = requests.post(
-                f"{self.cloud_endpoint}/upload",
-                headers={
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'filename': filename,
-                    'data': backup_data
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Successfully backed up checkpoints for account {account_id}")
-                return True
-            else:
-                logger.error(f"Failed to backup checkpoints: {response.status_code} - {response.text}")
-                return False
-                
+            stored = self._store_backup(account_id, data_type, self._backup_body(account_id, data_type, data))
+            if stored:
+                self._list_cache.pop(account_id, None)
+            return stored
         except Exception as e:
-            logger.error(f"Error backing up checkpoints: {e}")
+            logger.error(f"Error backing up {data_type}: {e}")
+            return False
+    
+    def _store_backup(self, account_id: str, data_type: str, body: bytes) -> bool:
+        """Upload an encoded backup to cloud storage"""
+        filename = self._get_backup_filename(account_id, data_type)
+        
+        # Upload to cloud storage, wrapping the already-encoded backup as {"filename": ..., "data": ...}
+        payload, compressed = self._compress_body(
+            b''.join((b'{"filename":', json_dumps(filename), b',"data":', body, b'}'))
+        )
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        response = self.http.post(
+            f"{self.cloud_endpoint}/upload",
+            headers=headers,
+            data=payload,
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            logger.info(f"Successfully backed up {data_type} for account {account_id}")
+            return True
+        else:
+            logger.error(f"Failed to backup {data_type}: {response.status_code} - {response.text}")
             return False
     
+    def backup_checkpoints(self, account_id: str, checkpoints: Dict) -> bool:
+        """Backup checkpoints to cloud storage"""
+        return self._backup_data(account_id, 'checkpoints', checkpoints)
+    
     def backup_scan_data(self, account_id: str, scan_data: Dict) -> bool:
         """Backup scan data to cloud storage"""
-        if not self.backup_enabled:
-            return False
-            
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'scan_data',
-                'timestamp': datetime.now().isoformat(),
-                'data': scan_data,
-                'hash': self._calculate_hash(scan_data)
-            }
-            
-            filename = self._get_backup_filename(account_id, 'scan_data')
-            
-            # Upload to cloud storage
-            response = requests.post(
-                f"{self.cloud_endpoint}/upload",
-                headers={
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'filename': filename,
-                    'data': backup_data
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Successfully backed up scan data for account {account_id}")
-                return True
-            else:
-                logger.error(f"Failed to backup scan data: {response.status_code} - {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error backing up scan data: {e}")
-            return False
-
+        return self._backup_data(account_id, 'scan_data', scan_data)
+    
     def backup_groups(self, account_id: str, groups_payload: Dict) -> bool:
         """Backup cached group list to cloud storage"""
-        if not self.backup_enabled:
-            return False
-
-        try:
-            payload = groups_payload or {}
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'groups',
-                'timestamp': datetime.now().isoformat(),
-                'data': payload,
-                'hash': self._calculate_hash(payload)
-            }
-
-            filename = self._get_backup_filename(account_id, 'groups')
-
-            response = requests.post(
-                f"{self.cloud_endpoint}/upload",
-                headers={
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'filename': filename,
-                    'data': backup_data
-                },
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                logger.info(f"Successfully backed up groups for account {account_id}")
-                return True
-            else:
-                logger.error(f"Failed to backup groups: {response.status_code} - {response.text}")
-                return False
-
-        except Exception as e:
-            logger.error(f"Error backing up groups: {e}")
-            return False
+        return self._backup_data(account_id, 'groups', groups_payload or {})
+    
+    def backup_bundle(self, account_id: str, bundle: Dict) -> bool:
+        """Backup checkpoints, scan data and groups to cloud storage in a single upload"""
+        return self._backup_data(account_id, 'bundle', bundle)
     
     def restore_latest_data(self, account_id: str, data_type: str) -> Optional[Dict]:
         """Restore latest data from cloud storage"""
@@ -161,7 +216,7 @@ class CloudStorageManager:
             return None
             
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.cloud_endpoint}/latest/{account_id}/{data_type}",
                 headers={
                     'Authorization': f'Bearer {self.api_key}',
@@ -175,7 +230,7 @@ class CloudStorageManager:
                 
                 # Verify data integrity
                 if 'data' in backup_data and 'hash' in backup_data:
-                    calculated_hash = self._calculate_hash(backup_data['data'])
+                    calculated_hash = self._calculate_hash(backup_data['data'], backup_data.get('hash_alg', 'md5'))
                     if calculated_hash == backup_data['hash']:
                         logger.info(f"Successfully restored {data_type} for account {account_id}")
                         return backup_data['data']
@@ -193,13 +248,29 @@ class CloudStorageManager:
             logger.error(f"Error restoring {data_type}: {e}")
             return None
     
+    def has_backup(self, account_id: str, data_type: Optional[str] = None) -> bool:
+        """Whether a backup of this account (of data_type, or of any type) may exist; remote backends
+        would need a request to tell, so they answer whether backups are enabled at all"""
+        return self.backup_enabled
+    
     def list_backups(self, account_id: str) -> list:
-        """List available backups for an account"""
+        """List available backups for an account (a listing is reused for LIST_CACHE_TTL seconds)"""
+        cached = self._list_cache.get(account_id)
+        if cached is not None and time.monotonic() - cached[0] < LIST_CACHE_TTL:
+            return list(cached[1])
+        backups = self._fetch_backup_list(account_id)
+        # Empty results are not kept: they may come from a failed request
+        if backups:
+            self._list_cache[account_id] = (time.monotonic(), backups)
+        return list(backups)
+    
+    def _fetch_backup_list(self, account_id: str) -> list:
+        """List available backups for an account from the storage backend"""
         if not self.backup_enabled:
             return []
             
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.cloud_endpoint}/list/{account_id}",
                 headers={
                     'Authorization': f'Bearer {self.api_key}',
@@ -224,7 +295,7 @@ class CloudStorageManager:
             return False
 
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.cloud_endpoint}/delete",
                 headers={
                     'Authorization': f'Bearer {self.api_key}',
@@ -237,6 +308,7 @@ class CloudStorageManager:
                 timeout=30
             )
             if response.status_code == 200:
+                self._list_cache.pop(account_id, None)
                 logger.info(f"Deleted backup {filename} for account {account_id}")
                 return True
             else:
@@ -262,9 +334,9 @@ class CloudStorageManager:
         filename = backup_entry.get('filename') or backup_entry.get('name')
         if filename:
             try:
-                # Filename format: telegram_delete_backup_{account}_{type}_{timestamp}.json
-                ts_part = filename.rstrip('.json').rsplit('_', 1)[-1]
-                return datetime.strptime(ts_part, "%Y%m%d_%H%M%S")
+                # Filename format: telegram_delete_backup_{account}_{type}_{timestamp}[_{counter}].json
+                match = _BACKUP_FILENAME_TS.search(filename)
+                return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S") if match else None
             except Exception:
                 return None
         return None
@@ -297,10 +369,14 @@ class CloudStorageManager:
 
     def sync_all_data(self, account_id: str, checkpoints: Dict, scan_data: Dict) -> Dict[str, bool]:
         """Sync all data to cloud storage"""
-        results = {
-            'checkpoints': self.backup_checkpoints(account_id, checkpoints),
-            'scan_data': self.backup_scan_data(account_id, scan_data)
-        }
+        # The two uploads are independent network round trips; run them side by side
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            checkpoints_future = executor.submit(self.backup_checkpoints, account_id, checkpoints)
+            scan_data_future = executor.submit(self.backup_scan_data, account_id, scan_data)
+            results = {
+                'checkpoints': checkpoints_future.result(),
+                'scan_data': scan_data_future.result()
+            }
         
         if all(results.values()):
             logger.info(f"Successfully synced all data for account {account_id}")
@@ -313,89 +389,113 @@ class CloudStorageManager:
 class LocalCloudStorage(CloudStorageManager):
     """Local file-based cloud storage for development/testing"""
     
+    # Data types that appear in backup filenames, used to tell the account id apart from the type
+    DATA_TYPES = ('checkpoints', 'scan_data', 'groups', 'bundle')
+    
     def __init__(self, local_backup_dir: str = "cloud_backups"):
         self.local_backup_dir = local_backup_dir
         os.makedirs(local_backup_dir, exist_ok=True)
         self.backup_enabled = True
         self.retention_days = int(os.getenv('CLOUD_BACKUP_RETENTION_DAYS', '7'))
+        # Account id -> {backup filename: (size, mtime)}, read from the account directory on first use
+        # and kept up to date by this instance's writes and deletes (see invalidate())
+        self._index: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        self._index_lock = threading.Lock()
+        self._migrate_flat_backups()
         logger.info(f"Using local cloud storage at: {local_backup_dir}")
     
+    def _get_account_dir(self, account_id: str) -> str:
+        """Per-account backup directory, so lookups only scan one account's backups"""
+        return os.path.join(self.local_backup_dir, account_id)
+    
     def _get_backup_path(self, account_id: str, data_type: str) -> str:
         """Get local backup file path"""
         filename = self._get_backup_filename(account_id, data_type)
-        return os.path.join(self.local_backup_dir, filename)
+        account_dir = self._get_account_dir(account_id)
+        ensure_dir(account_dir)
+        return os.path.join(account_dir, filename)
     
-    def backup_checkpoints(self, account_id: str, checkpoints: Dict) -> bool:
-        """Backup checkpoints to local file"""
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'checkpoints',
-                'timestamp': datetime.now().isoformat(),
-                'data': checkpoints,
-                'hash': self._calculate_hash(checkpoints)
-            }
-            
-            backup_path = self._get_backup_path(account_id, 'checkpoints')
-            
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"Successfully backed up checkpoints to {backup_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error backing up checkpoints locally: {e}")
-            return False
+    def _account_from_filename(self, filename: str) -> Optional[str]:
+        """Account id in telegram_delete_backup_{account}_{type}_{YYYYmmdd}_{HHMMSS}.json, or None"""
+        prefix = "telegram_delete_backup_"
+        if not filename.startswith(prefix) or not filename.endswith('.json'):
+            return None
+        parts = filename[len(prefix):-len('.json')].rsplit('_', 2)
+        if len(parts) != 3:
+            return None
+        for data_type in self.DATA_TYPES:
+            if parts[0].endswith(f"_{data_type}"):
+                return parts[0][:-len(data_type) - 1] or None
+        return None
     
-    def backup_scan_data(self, account_id: str, scan_data: Dict) -> bool:
-        """Backup scan data to local file"""
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'scan_data',
-                'timestamp': datetime.now().isoformat(),
-                'data': scan_data,
-                'hash': self._calculate_hash(scan_data)
-            }
-            
-            backup_path = self._get_backup_path(account_id, 'scan_data')
-            
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"Successfully backed up scan data to {backup_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error backing up scan data locally: {e}")
-            return False
-
-    def backup_groups(self, account_id: str, groups_payload: Dict) -> bool:
+    def _migrate_flat_backups(self):
+        """Move backups written before per-account directories into their account's directory"""
         try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'groups',
-                'timestamp': datetime.now().isoformat(),
-                'data': groups_payload,
-                'hash': self._calculate_hash(groups_payload or {})
-            }
-
-            backup_path = self._get_backup_path(account_id, 'groups')
-
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, ensure_ascii=False, indent=2)
-
-            logger.info(f"Successfully backed up groups to {backup_path}")
-            return True
-        except Exception as e:
-            logger.error(f"Error backing up groups locally: {e}")
-            return False
-
+            with os.scandir(self.local_backup_dir) as entries:
+                for entry in entries:
+                    account_id = self._account_from_filename(entry.name)
+                    if account_id and entry.is_file():
+                        account_dir = self._get_account_dir(account_id)
+                        ensure_dir(account_dir)
+                        os.replace(entry.path, os.path.join(account_dir, entry.name))
+        except OSError as e:
+            logger.warning(f"Error moving local backups into account directories: {e}")
+    
+    def _account_index(self, account_id: str) -> Dict[str, Tuple[int, float]]:
+        """In-memory listing of an account's backups (call with _index_lock held)"""
+        index = self._index.get(account_id)
+        if index is None:
+            index = {}
+            prefix = f"telegram_delete_backup_{account_id}_"
+            try:
+                with os.scandir(self._get_account_dir(account_id)) as entries:
+                    for entry in entries:
+                        if entry.name.startswith(prefix) and entry.name.endswith(('.json', '.json.gz')):
+                            stat = entry.stat()
+                            index[entry.name] = (stat.st_size, stat.st_mtime)
+            except FileNotFoundError:
+                pass
+            self._index[account_id] = index
+        return index
+    
+    def invalidate(self, account_id: Optional[str] = None):
+        """Forget the in-memory listing (of one account, or all) after backup files were changed externally"""
+        with self._index_lock:
+            if account_id is None:
+                self._index.clear()
+            else:
+                self._index.pop(account_id, None)
+    
+    def has_backup(self, account_id: str, data_type: Optional[str] = None) -> bool:
+        """Whether a local backup of this account (of data_type, or of any type) exists"""
+        prefix = f"telegram_delete_backup_{account_id}_{data_type}_" if data_type else ''
+        with self._index_lock:
+            return any(name.startswith(prefix) for name in self._account_index(account_id))
+    
+    def _store_backup(self, account_id: str, data_type: str, body: bytes) -> bool:
+        """Write an encoded backup to a local file"""
+        backup_path = self._get_backup_path(account_id, data_type)
+        
+        # Larger backups are kept gzipped (as .json.gz); restore_latest_data recognises them by their magic bytes
+        payload, compressed = self._compress_body(body)
+        if compressed:
+            backup_path += '.gz'
+        # Written under a temp name and renamed, so a crash never leaves a truncated "latest" backup behind;
+        # no fsync, as every backup gets a fresh name and older ones stay in place
+        atomic_write_bytes(backup_path, payload, durable=False)
+        stat = os.stat(backup_path)
+        with self._index_lock:
+            self._account_index(account_id)[os.path.basename(backup_path)] = (stat.st_size, stat.st_mtime)
+        
+        logger.info(f"Successfully backed up {data_type} to {backup_path}")
+        return True
+    
     def delete_backup(self, account_id: str, filename: str) -> bool:
         """Delete a local backup file"""
         try:
-            path = os.path.join(self.local_backup_dir, filename)
+            path = os.path.join(self._get_account_dir(account_id), filename)
+            with self._index_lock:
+                self._account_index(account_id).pop(filename, None)
             if os.path.exists(path):
                 os.remove(path)
                 logger.info(f"Deleted local backup {path}")
@@ -408,27 +508,25 @@ class LocalCloudStorage(CloudStorageManager):
     def restore_latest_data(self, account_id: str, data_type: str) -> Optional[Dict]:
         """Restore latest data from local files"""
         try:
-            # Find the latest backup file
-            backup_files = []
-            for filename in os.listdir(self.local_backup_dir):
-                if filename.startswith(f"telegram_delete_backup_{account_id}_{data_type}_"):
-                    backup_files.append(filename)
-            
-            if not backup_files:
+            # Find the latest backup file (timestamped names sort chronologically)
+            account_dir = self._get_account_dir(account_id)
+            prefix = f"telegram_delete_backup_{account_id}_{data_type}_"
+            with self._index_lock:
+                latest_file = max((name for name in self._account_index(account_id) if name.startswith(prefix)),
+                                  default=None)
+            
+            if not latest_file:
                 logger.warning(f"No local backup found for {data_type}")
                 return None
             
-            # Sort by timestamp (newest first)
-            backup_files.sort(reverse=True)
-            latest_file = backup_files[0]
-            backup_path = os.path.join(self.local_backup_dir, latest_file)
+            backup_path = os.path.join(account_dir, latest_file)
             
-            with open(backup_path, 'r', encoding='utf-8') as f:
-                backup_data = json.load(f)
+            with open(backup_path, 'rb') as f:
+                backup_data = self._decode_backup(f.read())
             
             # Verify data integrity
             if 'data' in backup_data and 'hash' in backup_data:
-                calculated_hash = self._calculate_hash(backup_data['data'])
+                calculated_hash = self._calculate_hash(backup_data['data'], backup_data.get('hash_alg', 'md5'))
                 if calculated_hash == backup_data['hash']:
                     logger.info(f"Successfully restored {data_type} from {latest_file}")
                     return backup_data['data']
@@ -446,16 +544,16 @@ class LocalCloudStorage(CloudStorageManager):
     def list_backups(self, account_id: str) -> list:
         """List available local backups for an account"""
         try:
-            backups = []
-            for filename in os.listdir(self.local_backup_dir):
-                if filename.startswith(f"telegram_delete_backup_{account_id}_"):
-                    file_path = os.path.join(self.local_backup_dir, filename)
-                    stat = os.stat(file_path)
-                    backups.append({
-                        'filename': filename,
-                        'size': stat.st_size,
-                        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
-                    })
+            with self._index_lock:
+                entries = list(self._account_index(account_id).items())
+            backups = [
+                {
+                    'filename': filename,
+                    'size': size,
+                    'modified': datetime.fromtimestamp(mtime).isoformat()
+                }
+                for filename, (size, mtime) in entries
+            ]
             
             return sorted(backups, key=lambda x: x['modified'], reverse=True)
             
@@ -474,12 +572,28 @@ class GitHubGistsStorage(CloudStorageManager):
         self.retention_days = int(os.getenv('CLOUD_BACKUP_RETENTION_DAYS', '7'))
         self.api_base = "https://api.github.com"
         self.gist_filename_prefix = "telegram_delete_backup_"
+        # Backup filename -> id of the gist holding it, learned from listings and from our own creates
+        self._gist_ids: Dict[str, str] = {}
+        # Backup filename -> data hash of what that gist file holds, to skip re-sending identical data
+        self._gist_hashes: Dict[str, bytes] = {}
         
         if not self.backup_enabled:
             logger.warning("GitHub token not configured. Using local storage fallback.")
         else:
             logger.info("Using GitHub Gists for cloud storage")
     
+    @cached_property
+    def http(self) -> requests.Session:
+        """Shared keep-alive session, with the GitHub API version header set once"""
+        session = super().http
+        session.headers['Accept'] = 'application/vnd.github.v3+json'
+        return session
+    
+    @cached_property
+    def _api_headers(self) -> Dict[str, str]:
+        """Auth header for api.github.com requests only, so the token is never sent to raw content URLs"""
+        return {'Authorization': f'token {self.github_token}'}
+    
     def _get_gist_description(self, account_id: str, data_type: str) -> str:
         """Generate Gist description"""
         return f"Telegram Delete Backup - {account_id} - {data_type}"
@@ -488,21 +602,23 @@ class GitHubGistsStorage(CloudStorageManager):
         """Generate Gist filename"""
         return f"{self.gist_filename_prefix}{account_id}_{data_type}.json"
     
+    def _remember_gists(self, gists: List[Dict]):
+        """Record the gist id of every backup file in a /gists listing"""
+        for gist in gists:
+            for filename in gist.get('files', {}):
+                if filename.startswith(self.gist_filename_prefix):
+                    self._gist_ids[filename] = gist['id']
+    
     def _find_existing_gist(self, account_id: str, data_type: str) -> Optional[Dict]:
         """Find existing Gist for this account and data type"""
         if not self.backup_enabled:
             return None
         
         try:
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            
             # List all user's gists
-            response = requests.get(
+            response = self.http.get(
                 f"{self.api_base}/gists",
-                headers=headers,
+                headers=self._api_headers,
                 timeout=10  # Shorter timeout to avoid hanging on startup
             )
             
@@ -511,6 +627,7 @@ class GitHubGistsStorage(CloudStorageManager):
                 return None
             
             gists = response.json()
+            self._remember_gists(gists)
             filename = self._get_gist_filename(account_id, data_type)
             
             # Find matching gist
@@ -525,81 +642,34 @@ class GitHubGistsStorage(CloudStorageManager):
             logger.debug(f"Error finding existing gist (non-critical): {e}")
             return None
     
-    def backup_checkpoints(self, account_id: str, checkpoints: Dict) -> bool:
-        """Backup checkpoints to GitHub Gist"""
-        if not self.backup_enabled:
-            return False
-        
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'checkpoints',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'data': checkpoints,
-                'hash': self._calculate_hash(checkpoints)
-            }
-            
-            return self._backup_to_gist(account_id, 'checkpoints', backup_data)
-        except Exception as e:
-            logger.error(f"Error backing up checkpoints to GitHub: {e}")
-            return False
+    def _backup_timestamp(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
     
-    def backup_scan_data(self, account_id: str, scan_data: Dict) -> bool:
-        """Backup scan data to GitHub Gist"""
-        if not self.backup_enabled:
-            return False
-        
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'scan_data',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'data': scan_data,
-                'hash': self._calculate_hash(scan_data)
-            }
-            
-            return self._backup_to_gist(account_id, 'scan_data', backup_data)
-        except Exception as e:
-            logger.error(f"Error backing up scan data to GitHub: {e}")
-            return False
-    
-    def backup_groups(self, account_id: str, groups_payload: Dict) -> bool:
-        """Backup groups to GitHub Gist"""
-        if not self.backup_enabled:
-            return False
-        
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'groups',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'data': groups_payload or {},
-                'hash': self._calculate_hash(groups_payload or {})
-            }
-            
-            return self._backup_to_gist(account_id, 'groups', backup_data)
-        except Exception as e:
-            logger.error(f"Error backing up groups to GitHub: {e}")
-            return False
-    
-    def _backup_to_gist(self, account_id: str, data_type: str, backup_data: Dict) -> bool:
+    def _store_backup(self, account_id: str, data_type: str, body: bytes) -> bool:
         """Backup data to GitHub Gist (create or update)"""
         try:
             filename = self._get_gist_filename(account_id, data_type)
-            content = json.dumps(backup_data, ensure_ascii=False, indent=2)
-            
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json',
-                'Content-Type': 'application/json'
-            }
+            # The gist file is overwritten in place, so identical data needs no API call at all
+            data_hash = self._body_hash(body)
+            if self._gist_hashes.get(filename) == data_hash:
+                logger.debug(f"GitHub Gist for {account_id}/{data_type} already holds this data")
+                return True
+            # Gist files hold text, so a compressed backup goes in base64 inside a small JSON wrapper
+            packed, compressed = self._compress_body(body)
+            if compressed:
+                content = json_dumps({'encoding': 'gzip+base64',
+                                      'data_b64': base64.b64encode(packed).decode('ascii')}).decode('utf-8')
+            else:
+                content = body.decode('utf-8')
             
-            # Check if gist already exists
-            existing_gist = self._find_existing_gist(account_id, data_type)
+            # Known gist ids skip listing every gist before the write
+            gist_id = self._gist_ids.get(filename)
+            if gist_id is None:
+                existing_gist = self._find_existing_gist(account_id, data_type)
+                gist_id = existing_gist['id'] if existing_gist else None
             
-            if existing_gist:
+            if gist_id:
                 # Update existing gist
-                gist_id = existing_gist['id']
                 payload = {
                     'description': self._get_gist_description(account_id, data_type),
                     'files': {
@@ -609,45 +679,50 @@ class GitHubGistsStorage(CloudStorageManager):
                     }
                 }
                 
-                response = requests.patch(
+                response = self.http.patch(
                     f"{self.api_base}/gists/{gist_id}",
-                    headers=headers,
+                    headers=self._api_headers,
                     json=payload,
                     timeout=30
                 )
                 
                 if response.status_code == 200:
+                    self._gist_hashes[filename] = data_hash
                     logger.info(f"Updated GitHub Gist for {account_id}/{data_type}")
                     return True
-                else:
+                if response.status_code != 404:
                     logger.error(f"Failed to update Gist: {response.status_code} - {response.text}")
                     return False
-            else:
-                # Create new gist
-                payload = {
-                    'description': self._get_gist_description(account_id, data_type),
-                    'public': False,  # Private gist
-                    'files': {
-                        filename: {
-                            'content': content
-                        }
+                # The gist was deleted elsewhere; create a new one
+                self._gist_ids.pop(filename, None)
+            
+            # Create new gist
+            payload = {
+                'description': self._get_gist_description(account_id, data_type),
+                'public': False,  # Private gist
+                'files': {
+                    filename: {
+                        'content': content
                     }
                 }
+            }
+            
+            response = self.http.post(
+                f"{self.api_base}/gists",
+                headers=self._api_headers,
+                json=payload,
+                timeout=30
+            )
+            
+            if response.status_code == 201:
+                self._gist_ids[filename] = response.json()['id']
+                self._gist_hashes[filename] = data_hash
+                logger.info(f"Created GitHub Gist for {account_id}/{data_type}")
+                return True
+            else:
+                logger.error(f"Failed to create Gist: {response.status_code} - {response.text}")
+                return False
                 
-                response = requests.post(
-                    f"{self.api_base}/gists",
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                )
-                
-                if response.status_code == 201:
-                    logger.info(f"Created GitHub Gist for {account_id}/{data_type}")
-                    return True
-                else:
-                    logger.error(f"Failed to create Gist: {response.status_code} - {response.text}")
-                    return False
-                    
         except Exception as e:
             logger.error(f"Error backing up to GitHub Gist: {e}")
             return False
@@ -669,19 +744,17 @@ class GitHubGistsStorage(CloudStorageManager):
             if not file_data:
                 return None
             
-            # Get file content (might be in raw_url or need another API call)
+            # Get file content from its raw URL (the listing normally includes it; otherwise it is derived from
+            # the owner and gist id), only falling back to fetching the whole gist through the API
             content_url = file_data.get('raw_url')
+            owner = (existing_gist.get('owner') or {}).get('login')
+            if not content_url and owner:
+                content_url = f"https://gist.githubusercontent.com/{owner}/{existing_gist['id']}/raw/{filename}"
             if not content_url:
-                # Fallback: get gist content directly
                 gist_id = existing_gist['id']
-                headers = {
-                    'Authorization': f'token {self.github_token}',
-                    'Accept': 'application/vnd.github.v3+json'
-                }
-                
-                response = requests.get(
+                response = self.http.get(
                     f"{self.api_base}/gists/{gist_id}",
-                    headers=headers,
+                    headers=self._api_headers,
                     timeout=30
                 )
                 
@@ -692,7 +765,7 @@ class GitHubGistsStorage(CloudStorageManager):
                 file_data = gist_data.get('files', {}).get(filename, {})
                 content = file_data.get('content', '')
             else:
-                response = requests.get(content_url, timeout=30)
+                response = self.http.get(content_url, timeout=30)
                 if response.status_code != 200:
                     return None
                 content = response.text
@@ -700,12 +773,13 @@ class GitHubGistsStorage(CloudStorageManager):
             if not content:
                 return None
             
-            backup_data = json.loads(content)
+            backup_data = self._decode_backup(content)
             
             # Verify data integrity
             if 'data' in backup_data and 'hash' in backup_data:
-                calculated_hash = self._calculate_hash(backup_data['data'])
+                calculated_hash = self._calculate_hash(backup_data['data'], backup_data.get('hash_alg', 'md5'))
                 if calculated_hash == backup_data['hash']:
+                    self._gist_hashes[filename] = calculated_hash.encode('ascii')
                     logger.info(f"Successfully restored {data_type} from GitHub Gist for {account_id}")
                     return backup_data['data']
                 else:
@@ -719,20 +793,15 @@ class GitHubGistsStorage(CloudStorageManager):
             logger.error(f"Error restoring {data_type} from GitHub: {e}")
             return None
     
-    def list_backups(self, account_id: str) -> List[Dict]:
+    def _fetch_backup_list(self, account_id: str) -> List[Dict]:
         """List available backups for an account"""
         if not self.backup_enabled:
             return []
         
         try:
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            
-            response = requests.get(
+            response = self.http.get(
                 f"{self.api_base}/gists",
-                headers=headers,
+                headers=self._api_headers,
                 timeout=30
             )
             
@@ -740,6 +809,7 @@ class GitHubGistsStorage(CloudStorageManager):
                 return []
             
             gists = response.json()
+            self._remember_gists(gists)
             backups = []
             prefix = self.gist_filename_prefix + account_id + "_"
             
@@ -780,18 +850,16 @@ class GitHubGistsStorage(CloudStorageManager):
                 return False
             
             gist_id = existing_gist['id']
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            
-            response = requests.delete(
+            response = self.http.delete(
                 f"{self.api_base}/gists/{gist_id}",
-                headers=headers,
+                headers=self._api_headers,
                 timeout=30
             )
             
             if response.status_code == 204:
+                self._gist_ids.pop(filename, None)
+                self._gist_hashes.pop(filename, None)
+                self._list_cache.pop(account_id, None)
                 logger.info(f"Deleted GitHub Gist {gist_id} for {account_id}/{data_type}")
                 return True
             else:
@@ -815,6 +883,8 @@ class BackblazeB2Storage(CloudStorageManager):
         self.retention_days = int(os.getenv('CLOUD_BACKUP_RETENTION_DAYS', '7'))
         self.b2_api = None
         self.bucket = None
+        # Digest of the accounts data last uploaded by backup_accounts
+        self._accounts_digest: Optional[bytes] = None
         
         if not self.backup_enabled:
             logger.warning("Backblaze B2 not configured. Missing: application_key_id, application_key, or bucket_name")
@@ -838,103 +908,24 @@ class BackblazeB2Storage(CloudStorageManager):
             return f"telegram_delete/{account_id}/{filename}"
         return f"telegram_delete/{account_id}/{data_type}/"
     
-    def backup_checkpoints(self, account_id: str, checkpoints: Dict) -> bool:
-        """Backup checkpoints to Backblaze B2"""
-        if not self.backup_enabled:
-            return False
-        
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'checkpoints',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'data': checkpoints,
-                'hash': self._calculate_hash(checkpoints)
-            }
-            
-            filename = self._get_backup_filename(account_id, 'checkpoints')
-            b2_path = self._get_b2_path(account_id, 'checkpoints', filename)
-            
-            # Convert to JSON string
-            content = json.dumps(backup_data, ensure_ascii=False, indent=2).encode('utf-8')
-            
-            # Upload to B2
-            self.bucket.upload_bytes(
-                data_bytes=content,
-                file_name=b2_path,
-                content_type='application/json'
-            )
-            
-            logger.info(f"Successfully backed up checkpoints to B2: {b2_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error backing up checkpoints to B2: {e}")
-            return False
+    def _backup_timestamp(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
     
-    def backup_scan_data(self, account_id: str, scan_data: Dict) -> bool:
-        """Backup scan data to Backblaze B2"""
-        if not self.backup_enabled:
-            return False
+    def _store_backup(self, account_id: str, data_type: str, body: bytes) -> bool:
+        """Upload an encoded backup to Backblaze B2"""
+        filename = self._get_backup_filename(account_id, data_type)
+        b2_path = self._get_b2_path(account_id, data_type, filename)
         
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'scan_data',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'data': scan_data,
-                'hash': self._calculate_hash(scan_data)
-            }
-            
-            filename = self._get_backup_filename(account_id, 'scan_data')
-            b2_path = self._get_b2_path(account_id, 'scan_data', filename)
-            
-            content = json.dumps(backup_data, ensure_ascii=False, indent=2).encode('utf-8')
-            
-            self.bucket.upload_bytes(
-                data_bytes=content,
-                file_name=b2_path,
-                content_type='application/json'
-            )
-            
-            logger.info(f"Successfully backed up scan data to B2: {b2_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error backing up scan data to B2: {e}")
-            return False
-    
-    def backup_groups(self, account_id: str, groups_payload: Dict) -> bool:
-        """Backup groups to Backblaze B2"""
-        if not self.backup_enabled:
-            return False
+        # Larger backups are stored gzipped; restore_latest_data recognises them by their magic bytes
+        payload, compressed = self._compress_body(body)
+        self.bucket.upload_bytes(
+            data_bytes=payload,
+            file_name=b2_path,
+            content_type='application/gzip' if compressed else 'application/json'
+        )
         
-        try:
-            backup_data = {
-                'account_id': account_id,
-                'data_type': 'groups',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'data': groups_payload or {},
-                'hash': self._calculate_hash(groups_payload or {})
-            }
-            
-            filename = self._get_backup_filename(account_id, 'groups')
-            b2_path = self._get_b2_path(account_id, 'groups', filename)
-            
-            content = json.dumps(backup_data, ensure_ascii=False, indent=2).encode('utf-8')
-            
-            self.bucket.upload_bytes(
-                data_bytes=content,
-                file_name=b2_path,
-                content_type='application/json'
-            )
-            
-            logger.info(f"Successfully backed up groups to B2: {b2_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error backing up groups to B2: {e}")
-            return False
+        logger.info(f"Successfully backed up {data_type} to B2: {b2_path}")
+        return True
     
     def restore_latest_data(self, account_id: str, data_type: str) -> Optional[Dict]:
         """Restore latest data from Backblaze B2"""
@@ -968,15 +959,14 @@ class BackblazeB2Storage(CloudStorageManager):
                 tmp.flush()
             try:
                 with open(tmp_path, 'rb') as f:
-                    content = f.read().decode('utf-8')
-                backup_data = json.loads(content)
+                    backup_data = self._decode_backup(f.read())
             finally:
                 if os.path.exists(tmp_path):
                     os.unlink(tmp_path)
             
             # Verify data integrity
             if 'data' in backup_data and 'hash' in backup_data:
-                calculated_hash = self._calculate_hash(backup_data['data'])
+                calculated_hash = self._calculate_hash(backup_data['data'], backup_data.get('hash_alg', 'md5'))
                 if calculated_hash == backup_data['hash']:
                     logger.info(f"Successfully restored {data_type} from B2 for {account_id}")
                     return backup_data['data']
@@ -991,7 +981,7 @@ class BackblazeB2Storage(CloudStorageManager):
             logger.error(f"Error restoring {data_type} from B2: {e}")
             return None
     
-    def list_backups(self, account_id: str) -> List[Dict]:
+    def _fetch_backup_list(self, account_id: str) -> List[Dict]:
         """List available backups for an account"""
         if not self.backup_enabled:
             return []
@@ -1028,6 +1018,7 @@ class BackblazeB2Storage(CloudStorageManager):
                 if file_info.file_name.endswith(filename):
                     file_version = self.bucket.get_file_info_by_name(file_info.file_name)
                     self.bucket.delete_file_version(file_version.id_, file_info.file_name)
+                    self._list_cache.pop(account_id, None)
                     logger.info(f"Deleted B2 backup {file_info.file_name} for account {account_id}")
                     return True
             
@@ -1044,15 +1035,22 @@ class BackblazeB2Storage(CloudStorageManager):
             return False
         
         try:
+            # Accounts are saved far more often than they change; skip re-hashing and re-uploading identical data
+            digest = payload_digest(json_dumps(accounts_data))
+            if digest == self._accounts_digest:
+                logger.debug("Skipping unchanged accounts.json backup to B2")
+                return True
+            
             backup_data = {
                 'data_type': 'accounts',
                 'timestamp': datetime.now(timezone.utc).isoformat(),
                 'data': accounts_data,
+                'hash_alg': BACKUP_HASH_ALG,
                 'hash': self._calculate_hash(accounts_data)
             }
             
             b2_path = "telegram_delete/accounts.json"
-            content = json.dumps(backup_data, ensure_ascii=False, indent=2).encode('utf-8')
+            content = json_dumps(backup_data)
             
             self.bucket.upload_bytes(
                 data_bytes=content,
@@ -1060,6 +1058,7 @@ class BackblazeB2Storage(CloudStorageManager):
                 content_type='application/json'
             )
             
+            self._accounts_digest = digest
             logger.info(f"Successfully backed up accounts.json to B2")
             return True
             
@@ -1095,7 +1094,7 @@ class BackblazeB2Storage(CloudStorageManager):
                 
                 # Verify data integrity
                 if 'data' in backup_data and 'hash' in backup_data:
-                    calculated_hash = self._calculate_hash(backup_data['data'])
+                    calculated_hash = self._calculate_hash(backup_data['data'], backup_data.get('hash_alg', 'md5'))
                     if calculated_hash == backup_data['hash']:
                         logger.info("Successfully restored accounts.json from B2")
                         return backup_data['data']
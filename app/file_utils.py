@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Directories already known to exist in this process
+_SEEN_DIRS: Set[str] = set()
+
+# Files written through write_if_changed: path -> (payload digest, file signature right after the write)
+_WRITTEN: Dict[str, Tuple[bytes, Optional[Tuple[int, int]]]] = {}
+
+# Stdlib fallback encoder for json_dumps, built once instead of per call (the stored data is plain
+# dicts/lists/scalars, so the circular-reference bookkeeping is skipped)
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=False)
+
+
+def ensure_dir(path: str):
+    """Create a directory once per process, skipping the mkdir/stat syscalls on repeat calls"""
+    if not path or path in _SEEN_DIRS:
+        return
+    os.makedirs(path, exist_ok=True)
+    _SEEN_DIRS.add(path)
+
+
+def atomic_write_bytes(path: str, payload: bytes, tmp_path: Optional[str] = None, durable: bool = True):
+    """Write payload with a single write() to a temp file, fsync it (if durable), then atomically swap it into place"""
+    tmp_path = tmp_path or f"{path}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        fh.write(payload)
+        if durable:
+            fh.flush()
+            os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Cheap change detector for a file: (mtime_ns, size), or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def payload_digest(payload: bytes) -> bytes:
+    """Short content digest used to detect unchanged payloads"""
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def write_if_changed(path: str, payload: bytes, tmp_path: Optional[str] = None,
+                     digest: Optional[bytes] = None) -> bool:
+    """atomic_write_bytes, skipped if the file still holds exactly the bytes last written to it here"""
+    digest = digest or payload_digest(payload)
+    last = _WRITTEN.get(path)
+    if last is not None and last[0] == digest and last[1] == file_signature(path):
+        return False
+    atomic_write_bytes(path, payload, tmp_path)
+    _WRITTEN[path] = (digest, file_signature(path))
+    return True
+
+
+def json_dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None, sort_keys: bool = False) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes (orjson when available, stdlib otherwise)"""
+    if orjson is not None:
+        # Like the stdlib encoder, accept int/None/etc. dict keys and write them as strings
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS if sort_keys else orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+    if default is None and not sort_keys:
+        return _JSON_ENCODER.encode(obj).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default,
+                      sort_keys=sort_keys).encode('utf-8')
+
+
+def json_loads(raw) -> Any:
+    """Parse JSON from bytes or str (orjson when available, stdlib otherwise)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
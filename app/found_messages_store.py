@@ -1,10 +1,11 @@
-import json
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 
+from .file_utils import json_dumps, json_loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -65,8 +66,7 @@ class FoundMessagesStore:
         if not self.file_path.exists():
             return
         try:
-            with self.file_path.open("r", encoding="utf-8") as fh:
-                payload = json.load(fh)
+            payload = json_loads(self.file_path.read_bytes())
         except Exception as exc:
             logger.error(f"Failed to load found messages for {self.account_id}: {exc}")
             return
@@ -109,8 +109,7 @@ class FoundMessagesStore:
                 "owner_id": self.owner_id,
                 "messages": [asdict(message) for message in self.messages.values()],
             }
-            with self.file_path.open("w", encoding="utf-8") as fh:
-                json.dump(payload, fh, ensure_ascii=False, indent=2)
+            self.file_path.write_bytes(json_dumps(payload))
         except Exception as exc:
             logger.error(f"Failed to persist found messages for {self.account_id}: {exc}")
 
@@ -1,10 +1,11 @@
-import json
 from dataclasses import dataclass, asdict, field
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Iterable, Any
 import logging
 
+from .file_utils import json_dumps, json_loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -77,8 +78,7 @@ class GroupStore:
     def _load(self):
         if self.file_path.exists():
             try:
-                with self.file_path.open('r', encoding='utf-8') as fh:
-                    payload = json.load(fh)
+                payload = json_loads(self.file_path.read_bytes())
                 if isinstance(payload, dict) and 'groups' in payload:
                     groups = payload.get('groups', [])
                     self.synced_at = payload.get('synced_at')
@@ -111,8 +111,7 @@ class GroupStore:
                 'synced_at': self.synced_at,
                 'groups': [asdict(record) for record in self.records.values()]
             }
-            with self.file_path.open('w', encoding='utf-8') as fh:
-                json.dump(payload, fh, ensure_ascii=False, indent=2)
+            self.file_path.write_bytes(json_dumps(payload))
         except Exception as exc:
             logger.error(f"Error saving group store for account {self.account_id}: {exc}")
 
@@ -804,7 +804,7 @@ async def get_scan_status(account_id: str):
         
         # Get current scan progress
         progress = deleter.checkpoint_manager.get_progress() or {}
-        scanned_chats = progress.get('scanned_chats', []) or []
+        scanned_chats = list(progress.get('scanned_chats', []) or [])
         
         # Get all checkpoints (previous scan results) and merge with progress
         checkpoints = deleter.checkpoint_manager.get_all_checkpoints()
@@ -925,8 +925,8 @@ async def clear_scan_cache(account_id: str):
         if not deleter:
             return {"success": False, "error": "Account not found"}
         
-        # Clear scan cache (keeps session/auth data)
-        deleter.checkpoint_manager.clear_scan_cache()
+        # Clear scan cache (keeps session/auth data); it waits on pending file writes, so keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, deleter.checkpoint_manager.clear_scan_cache)
         
         # Also clear found messages store if exists
         if hasattr(deleter, 'found_messages_store'):
@@ -1398,6 +1398,10 @@ async def delete_messages_endpoint(account_id: str, request: dict):
                 deleted_count,
                 len(message_ids)
             )
+            # Snapshot on the event loop, which keeps changing the checkpoints, then wait for the write off it;
+            # the cloud upload is left to the debounce timer
+            deleter.checkpoint_manager.flush(upload=False, wait=False)
+            await asyncio.get_running_loop().run_in_executor(None, deleter.checkpoint_manager.wait_for_writes)
             deleter.checkpoint_manager.increment_group_deleted(str(chat_id), deleted_count)
 
             store = getattr(deleter, "found_messages_store", None)
@@ -1654,21 +1658,16 @@ async def get_temporary_messages(account_id: str):
         active_messages = checkpoint_manager.get_active_temporary_messages()
         logger.info(f"Found {len(active_messages)} active temporary messages for {account_id}")
         
-        # Calculate minutes remaining for each message
-        now = datetime.now(timezone.utc)
         temporary_messages = []
-        for key, msg in active_messages.items():
-            deletes_at = datetime.fromisoformat(msg['deletes_at'].replace('Z', '+00:00'))
-            minutes_remaining = max(0, int((deletes_at - now).total_seconds() / 60))
-            
+        for msg in active_messages:
             temporary_messages.append({
-                'key': key,
+                'key': msg['key'],
                 'chat_id': msg['chat_id'],
                 'chat_title': msg['chat_title'],
                 'message_id': msg['message_id'],
                 'sent_at': msg['sent_at'],
                 'deletes_at': msg['deletes_at'],
-                'minutes_remaining': minutes_remaining
+                'minutes_remaining': msg['minutes_remaining']
             })
         
         logger.info(f"Returning {len(temporary_messages)} temporary messages for {account_id}")
@@ -4210,6 +4209,7 @@ async def restore_from_b2():
                 acc_id: Account(**acc_data) 
                 for acc_id, acc_data in restored_data.items()
             }
+            account_store._rebuild_id_bitmap()
             account_store._save_local()
             
             # Restore sessions
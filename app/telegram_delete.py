@@ -1610,6 +1610,10 @@ class TelegramDeleter:
                     'messages_found': message_count
                 })
             
+            # Snapshot on the event loop, which keeps changing the checkpoints, then wait for the write off it;
+            # the cloud upload is left to the debounce timer
+            self.checkpoint_manager.flush(upload=False, wait=False)
+            await asyncio.get_running_loop().run_in_executor(None, self.checkpoint_manager.wait_for_writes)
             self.update_status(f"Deletion complete! Deleted {total_deleted} messages across {processed_count} chats")
             
             return OperationResult(
@@ -2132,7 +2136,7 @@ class TelegramDeleter:
                                 chat_id=chat_id,
                                 chat_title=chat_title,
                                 message_id=message_id,
-                                sent_at=finished_at.isoformat()
+                                sent_at=finished_at
                             )
                             result_entry['self_destruct'] = True
                             result_entry['deletes_at'] = (finished_at + timedelta(hours=1)).isoformat()
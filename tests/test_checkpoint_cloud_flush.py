@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SCRIPT = textwrap.dedent("""
+    from app import checkpoint_manager
+    from app.checkpoint_manager import CheckpointManager
+
+    # Longer than the test timeout: the process must neither wait for the timer nor skip its upload
+    checkpoint_manager.CLOUD_BACKUP_DEBOUNCE = 60
+    manager = CheckpointManager('acc_1')
+    manager.update_checkpoint(10, 'Group 10', 5, 1, 2)
+    manager.save_checkpoints()
+    # Exits without flush(): the atexit hook must upload the debounced backup
+""")
+
+
+def test_cloud_backup_uploaded_at_exit_without_flush(tmp_path):
+    env = {k: v for k, v in os.environ.items()
+           if k not in ('GITHUB_TOKEN', 'B2_APPLICATION_KEY_ID', 'B2_APPLICATION_KEY', 'B2_BUCKET_NAME')}
+    env['PYTHONPATH'] = str(REPO_ROOT)
+
+    subprocess.run([sys.executable, '-c', SCRIPT], cwd=tmp_path, env=env, check=True, timeout=30)
+
+    backup_dir = tmp_path / 'cloud_backups' / 'acc_1'
+    backups = [p.name for p in backup_dir.iterdir()] if backup_dir.is_dir() else []
+    assert any(name.startswith('telegram_delete_backup_acc_1_bundle_') for name in backups)